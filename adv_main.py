@@ -1,172 +1,194 @@
 # simple_main.py - Enhanced version with history and interactive visualization
 
+import sys
+from operator import itemgetter
 from advanced_pipeline import AdvancedSQLPipeline
 from visualization import AdvancedDataVisualizer as DataAnalyzer
 from history import ChatHistory
 
 def display_results(result):
     """Display results in a nice format"""
-    print("\n" + "="*60)
+    # Build the whole block and write it once instead of printing line by line
+    lines = ["\n" + "="*60]
 
     if result['success']:
-        print("✅ SUCCESS")
-        print(f"Question: {result['user_question']}")
-        print(f"Table: {result['target_table']}")
-        print(f"SQL: {result['sql_query']}")
-        print(f"Found: {result['result_count']} rows")
+        lines.append("✅ SUCCESS")
+        lines.append(f"Question: {result['user_question']}")
+        lines.append(f"Table: {result['target_table']}")
+        lines.append(f"SQL: {result['sql_query']}")
+        lines.append(f"Found: {result['result_count']} rows")
 
         # Show first few results
         if result['results']:
-            print("\n📊 Results:")
-            print("-" * 40)
+            lines.append("\n📊 Results:")
+            lines.append("-" * 40)
 
             # Show headers
             headers = list(result['results'][0].keys())
-            print(" | ".join(headers))
-            print("-" * 40)
+            lines.append(" | ".join(headers))
+            lines.append("-" * 40)
 
-            # Show first 5 rows
-            for i, row in enumerate(result['results'][:5]):
-                values = [str(row[col]) for col in headers]
-                print(" | ".join(values))
+            # Show first 5 rows (itemgetter returns a bare value for one column)
+            get_values = itemgetter(*headers)
+            single_column = len(headers) == 1
+            for row in result['results'][:5]:
+                values = (get_values(row),) if single_column else get_values(row)
+                lines.append(" | ".join(map(str, values)))
 
             if len(result['results']) > 5:
-                print(f"... and {len(result['results']) - 5} more rows")
+                lines.append(f"... and {len(result['results']) - 5} more rows")
         else:
-            print("No data found")
+            lines.append("No data found")
 
     else:
-        print("❌ FAILED")
-        print(f"Error: {result['error']}")
+        lines.append("❌ FAILED")
+        lines.append(f"Error: {result['error']}")
 
-    print("="*60)
+    lines.append("="*60)
+    sys.stdout.write("\n".join(lines) + "\n")
 
-def handle_visualization_command(command, analyzer):
-    """Handle user visualization commands"""
-    command = command.lower().strip()
-    parts = command.split()
-    
-    if not parts:
-        return False
-    
-    action = parts[0]
-    
-    try:
-        if action == "histogram":
-            if len(parts) >= 2:
-                column = parts[1]
-            else:
-                # Pick first numeric column
-                numeric_cols = analyzer.df.select_dtypes(include=['number']).columns
-                if len(numeric_cols) > 0:
-                    column = numeric_cols[0]
-                    print(f"📊 Creating histogram for {column} (auto-selected)...")
-                else:
-                    print("❌ No numeric column available for histogram")
-                    return True
-            analyzer.create_histogram(column)
-            return True
-            
-        elif action == "pie":
-            if len(parts) >= 2:
-                labels_col = parts[1]
-                values_col = analyzer.df.select_dtypes(include=['number']).columns[0] \
-                    if len(analyzer.df.select_dtypes(include=['number']).columns) > 0 else None
-            else:
-                # Auto-pick first categorical + numeric
-                cat_cols = analyzer.df.select_dtypes(include=['object']).columns
-                num_cols = analyzer.df.select_dtypes(include=['number']).columns
-                if len(cat_cols) > 0 and len(num_cols) > 0:
-                    labels_col, values_col = cat_cols[0], num_cols[0]
-                    print(f"🥧 Creating pie chart for {labels_col} by {values_col} (auto-selected)...")
-                else:
-                    print("❌ Need at least one categorical and one numeric column for pie chart")
-                    return True
-            analyzer.create_pie_chart(labels_col, values_col)
-            return True
-            
-        elif action == "scatter":
-            if len(parts) >= 3:
-                x_col, y_col = parts[1], parts[2]
-            else:
-                # Auto-pick first two numeric columns
-                num_cols = analyzer.df.select_dtypes(include=['number']).columns
-                if len(num_cols) >= 2:
-                    x_col, y_col = num_cols[0], num_cols[1]
-                    print(f"🔍 Creating scatter plot: {x_col} vs {y_col} (auto-selected)...")
-                else:
-                    print("❌ Need at least two numeric columns for scatter plot")
-                    return True
-            analyzer.create_scatter_plot(x_col, y_col)
-            return True
-            
-        elif action == "line":
-            if len(parts) >= 3:
-                x_col, y_col = parts[1], parts[2]
-            else:
-                # Auto-pick first date/numeric combination
-                date_cols = analyzer.df.select_dtypes(include=['datetime64']).columns
-                num_cols = analyzer.df.select_dtypes(include=['number']).columns
-                if len(date_cols) > 0 and len(num_cols) > 0:
-                    x_col, y_col = date_cols[0], num_cols[0]
-                    print(f"📈 Creating line chart: {y_col} over {x_col} (auto-selected)...")
-                else:
-                    print("❌ Need a date (or sequential) and a numeric column for line chart")
-                    return True
-            analyzer.create_line_chart(x_col, y_col)
-            return True
-            
-        elif action == "bar":
-            if len(parts) >= 2:
-                column = parts[1]
-            else:
-                # Auto-pick first categorical column
-                cat_cols = analyzer.df.select_dtypes(include=['object']).columns
-                if len(cat_cols) > 0:
-                    column = cat_cols[0]
-                    print(f"📊 Creating bar chart for {column} (auto-selected)...")
-                else:
-                    print("❌ No categorical column available for bar chart")
-                    return True
-            analyzer.create_bar_chart(x_col=column)
+def _auto_pick(analyzer, group, count=1):
+    """Return the first `count` columns of a dtype group, or None if there aren't enough"""
+    cols = analyzer._col_groups[group]
+    return cols[:count] if len(cols) >= count else None
+
+def _do_histogram(parts, analyzer):
+    if len(parts) >= 2:
+        column = parts[1]
+    else:
+        # Pick first numeric column
+        picked = _auto_pick(analyzer, 'number')
+        if not picked:
+            print("❌ No numeric column available for histogram")
             return True
-            
-        elif action == "box":
-            if len(parts) >= 2:
-                column = parts[1]
-            else:
-                # Auto-pick first numeric column
-                num_cols = analyzer.df.select_dtypes(include=['number']).columns
-                if len(num_cols) > 0:
-                    column = num_cols[0]
-                    print(f"📦 Creating box plot for {column} (auto-selected)...")
-                else:
-                    print("❌ No numeric column available for box plot")
-                    return True
-            analyzer.plot_box(column)
+        column = picked[0]
+        print(f"📊 Creating histogram for {column} (auto-selected)...")
+    analyzer.create_histogram(column)
+    return True
+
+def _do_pie(parts, analyzer):
+    num_pick = _auto_pick(analyzer, 'number')
+    if len(parts) >= 2:
+        labels_col = parts[1]
+        values_col = num_pick[0] if num_pick else None
+    else:
+        # Auto-pick first categorical + numeric
+        cat_pick = _auto_pick(analyzer, 'object')
+        if not (cat_pick and num_pick):
+            print("❌ Need at least one categorical and one numeric column for pie chart")
             return True
-            
-        elif action == "heatmap":
-            print(f"🔥 Creating correlation heatmap...")
-            analyzer.plot_corr_heatmap()
+        labels_col, values_col = cat_pick[0], num_pick[0]
+        print(f"🥧 Creating pie chart for {labels_col} by {values_col} (auto-selected)...")
+    analyzer.create_pie_chart(labels_col, values_col)
+    return True
+
+def _do_scatter(parts, analyzer):
+    if len(parts) >= 3:
+        x_col, y_col = parts[1], parts[2]
+    else:
+        # Auto-pick first two numeric columns
+        picked = _auto_pick(analyzer, 'number', 2)
+        if not picked:
+            print("❌ Need at least two numeric columns for scatter plot")
             return True
-            
-        elif action == "options":
-            analyzer.show_plot_options()
+        x_col, y_col = picked
+        print(f"🔍 Creating scatter plot: {x_col} vs {y_col} (auto-selected)...")
+    analyzer.create_scatter_plot(x_col, y_col)
+    return True
+
+def _do_line(parts, analyzer):
+    if len(parts) >= 3:
+        x_col, y_col = parts[1], parts[2]
+    else:
+        # Auto-pick first date/numeric combination
+        date_pick = _auto_pick(analyzer, 'datetime64')
+        num_pick = _auto_pick(analyzer, 'number')
+        if not (date_pick and num_pick):
+            print("❌ Need a date (or sequential) and a numeric column for line chart")
             return True
-            
-        elif action == "summary":
-            analyzer.safe_analyze()
+        x_col, y_col = date_pick[0], num_pick[0]
+        print(f"📈 Creating line chart: {y_col} over {x_col} (auto-selected)...")
+    analyzer.create_line_chart(x_col, y_col)
+    return True
+
+def _do_bar(parts, analyzer):
+    if len(parts) >= 2:
+        column = parts[1]
+    else:
+        # Auto-pick first categorical column
+        picked = _auto_pick(analyzer, 'object')
+        if not picked:
+            print("❌ No categorical column available for bar chart")
             return True
-            
-        elif action == "auto":
-            print("🚀 Auto-generating the best visualization...")
-            analyzer.auto_visualize()
+        column = picked[0]
+        print(f"📊 Creating bar chart for {column} (auto-selected)...")
+    analyzer.create_bar_chart(x_col=column)
+    return True
+
+def _do_box(parts, analyzer):
+    if len(parts) >= 2:
+        column = parts[1]
+    else:
+        # Auto-pick first numeric column
+        picked = _auto_pick(analyzer, 'number')
+        if not picked:
+            print("❌ No numeric column available for box plot")
             return True
-            
-        else:
-            return False
-            
+        column = picked[0]
+        print(f"📦 Creating box plot for {column} (auto-selected)...")
+    analyzer.plot_box(column)
+    return True
+
+def _do_heatmap(parts, analyzer):
+    print(f"🔥 Creating correlation heatmap...")
+    analyzer.plot_corr_heatmap()
+    return True
+
+def _do_options(parts, analyzer):
+    analyzer.show_plot_options()
+    return True
+
+def _do_summary(parts, analyzer):
+    analyzer.safe_analyze()
+    return True
+
+def _do_auto(parts, analyzer):
+    print("🚀 Auto-generating the best visualization...")
+    analyzer.auto_visualize()
+    return True
+
+# Visualization command -> handler(parts, analyzer)
+_DISPATCH = {
+    'histogram': _do_histogram,
+    'pie': _do_pie,
+    'scatter': _do_scatter,
+    'line': _do_line,
+    'bar': _do_bar,
+    'box': _do_box,
+    'heatmap': _do_heatmap,
+    'options': _do_options,
+    'summary': _do_summary,
+    'auto': _do_auto,
+}
+_VIZ_COMMANDS = frozenset(_DISPATCH)
+
+def handle_visualization_command(command, analyzer, parts=None):
+    """Handle user visualization commands
+    
+    `parts` is the already lowercased and split command, if the caller has it.
+    """
+    if parts is None:
+        parts = command.lower().split()
+    
+    if not parts:
+        return False
+    
+    handler = _DISPATCH.get(parts[0])
+    if handler is None:
+        return False
+    
+    try:
+        return handler(parts, analyzer)
     except Exception as e:
         print(f"❌ Error creating plot: {e}")
         return True
@@ -193,6 +215,7 @@ def show_help():
     print("   • history - Show chat history")
     print("   • clear - Clear chat history")
     print("   • schema - Show database schema")
+    print("   • schema refresh - Re-read the schema from the database")
     print("   • help - Show this help message")
     print("   • exit - Quit the application")
     print("\n🚀 Advanced SQL Features:")
@@ -223,37 +246,40 @@ def main():
 
     current_analyzer = None
 
+    # Fixed commands that don't touch the loop state
+    command_handlers = {
+        'help': show_help,
+        'history': chat_history.show_history,
+        'schema': pipeline.show_schema,
+        'schema refresh': lambda: pipeline.show_schema(refresh=True),
+    }
+
     while True:
         user_input = input("\n💬 Ask me about your data: ").strip()
+        lowered = user_input.lower()
 
-        if user_input.lower() == 'exit':
+        if lowered == 'exit':
             print("👋 Goodbye!")
             break
 
-        if user_input.lower() == 'help':
-            show_help()
-            continue
-
-        if user_input.lower() == 'history':
-            chat_history.show_history()
+        handler = command_handlers.get(lowered)
+        if handler:
+            handler()
             continue
 
-        if user_input.lower() == 'clear':
+        if lowered == 'clear':
             chat_history.clear()
             current_analyzer = None
             print("🗑️  Chat history cleared.")
             continue
 
-        if user_input.lower() == 'schema':
-            pipeline.show_schema()
-            continue
-
         if not user_input:
             continue
 
         # Check if this is a visualization command for existing data
-        if current_analyzer and user_input.lower().startswith(('histogram', 'pie', 'scatter', 'line', 'bar', 'box', 'heatmap', 'options', 'summary', 'auto')):
-            if handle_visualization_command(user_input, current_analyzer):
+        parts = lowered.split()
+        if current_analyzer and parts[0] in _VIZ_COMMANDS:
+            if handle_visualization_command(user_input, current_analyzer, parts):
                 continue
             else:
                 print("❌ Invalid visualization command. Type 'options' to see available plots.")
@@ -271,7 +297,7 @@ def main():
         # Set up visualization if successful
         if result['success'] and result['results']:
             try:
-                current_analyzer = DataAnalyzer(result['results'])
+                current_analyzer = DataAnalyzer(df=result['dataframe'])
                 chat_history.add_analyzer(current_analyzer)
                 
                 # Show data summary
@@ -1,10 +1,109 @@
 # advanced_pipeline.py - Advanced SQL Pipeline with Full Database Support
 
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
-from sqlalchemy import create_engine, text, inspect
-from config import GROQ_API_KEY, MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB
+from sqlalchemy import text, inspect
+from config import GROQ_API_KEY, MYSQL_DB, CACHE_DIR
+from db_utils import get_engine
+from async_utils import gather_limited
+from llm_cache import LLMCache
+from cache_utils import is_cache_fresh
+import atexit
+import hashlib
+import os
+import pickle
 import re
-from typing import List, Dict, Any, Optional
+import pandas as pd
+from itertools import groupby
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Tuple
+
+# Inspected schemas are pickled to CACHE_DIR between runs
+SCHEMA_CACHE_TTL = 24 * 60 * 60  # seconds before a cached schema is re-inspected
+
+# Regexes used on every query, compiled once at import
+_RE_MD_FENCE = re.compile(r'```sql\n?|```\n?')
+_RE_CODE_BLOCK = re.compile(r'```(?:sql)?\s*\n?(.*?)\n?```', re.DOTALL | re.IGNORECASE)
+_RE_SQL_START = re.compile(r'(SELECT\s+.+|WITH\s+.+)', re.IGNORECASE | re.DOTALL)
+_SQL_KW_RE = re.compile(r'\b(?:SELECT|WITH|FROM|JOIN)\b', re.IGNORECASE)
+_RE_TABLES = re.compile(r'(?:FROM|JOIN|LEFT\s+JOIN|RIGHT\s+JOIN|INNER\s+JOIN|FULL\s+JOIN)\s+(\w+)', re.IGNORECASE)
+
+# Statements we never let through, matched as whole words only
+_DANGEROUS = frozenset({'DROP', 'DELETE', 'UPDATE', 'INSERT', 'CREATE', 'ALTER', 'TRUNCATE', 'EXEC', 'EXECUTE'})
+_TOKEN_RE = re.compile(r'\b[A-Z]+\b')
+
+# Prompt used to turn a question into SQL. Everything except the question goes
+# into one system message built per schema, so it is identical across queries
+# and providers with prefix caching can reuse it.
+_PROMPT_HEAD = """
+You are an expert SQL developer for MySQL database. Generate a SQL query based on the user's question.
+
+Database Schema:
+"""
+
+_PROMPT_RULES = """
+
+Requirements:
+1. Return ONLY the SQL query, no explanations
+2. ALWAYS consult the schema above before generating SQL
+3. If the requested column does not exist in the mentioned table, 
+identify the correct table from the schema and JOIN using the foreign keys
+If the user asks for "category" or any field not directly in the base table, 
+look at the schema foreign keys to trace the correct relationship. 
+
+For example:
+- To get category from orders, you must JOIN orders → order_details → products → categories.
+- Never assume a column exists directly in orders if the schema does not list it.
+4. Use proper JOIN syntax when multiple tables are needed
+5. Support CTEs (WITH clauses) if they make the query clearer
+6. Support window functions if needed
+7. Use proper table aliases for clarity
+8. Handle complex WHERE conditions properly
+9. Use appropriate aggregation functions
+10. Start with SELECT statement
+11. Do not add a semicolon at the end
+12. Use MySQL syntax (NOT PostgreSQL)
+13. When aggregating data across multiple tables (e.g., counting orders by category), 
+avoid double-counting by using CTEs or DISTINCT as needed.
+14. If an order may appear multiple times due to joins with order_details or products, 
+use COUNT(DISTINCT order_id) or an intermediate CTE to ensure correct results.
+
+
+IMPORTANT: Use MySQL date functions:
+- Instead of DATE_TRUNC('month', date) use: DATE_FORMAT(date, '%Y-%m-01')
+- Instead of DATE_TRUNC('year', date) use: DATE_FORMAT(date, '%Y-01-01')
+- For date arithmetic use: DATE_ADD(), DATE_SUB(), INTERVAL
+- Use realistic date ranges: '1990-01-01' instead of '2020-01-01' for sample databases
+
+When the query requires information across multiple tables, 
+derive the JOINs from the foreign key relationships in the schema.
+Do NOT assume a column exists in a table if the schema does not list it.
+
+Examples of what you can generate:
+- Simple queries: SELECT * FROM customers
+- JOINs: SELECT c.name, o.order_date FROM customers c JOIN orders o ON c.id = o.customer_id
+- CTEs: WITH recent_orders AS (SELECT * FROM orders WHERE order_date > '1990-01-01') SELECT * FROM recent_orders
+- Window functions: SELECT *, ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY price) as rn FROM products
+- Complex aggregations: SELECT category, COUNT(*), AVG(price) FROM products GROUP BY category HAVING COUNT(*) > 5
+- Date grouping: SELECT DATE_FORMAT(order_date, '%Y-%m-01') as month, COUNT(*) FROM orders GROUP BY month"""
+
+# Per-query user message, wrapped around the question
+_QUESTION_HEAD = 'User Question: "'
+_QUESTION_TAIL = '"\n\nSQL Query:'
+
+
+def _dedupe_columns(columns) -> List[str]:
+    """Column labels with repeats renamed name, name_2, name_3, ..."""
+    labels = []
+    taken = set()
+    for col in columns:
+        label, n = col, 1
+        while label in taken:
+            n += 1
+            label = f"{col}_{n}"
+        taken.add(label)
+        labels.append(label)
+    return labels
 
 
 class AdvancedSQLPipeline:
@@ -27,6 +126,11 @@ class AdvancedSQLPipeline:
         # Create database connection
         self.engine = self._create_db_connection()
         
+        # One long-lived connection for all queries. The chatbot reads questions
+        # from stdin one at a time, so it is only ever used from a single thread.
+        self._conn = self.engine.connect()
+        atexit.register(self._conn.close)
+        
         # Initialize the LLM (Large Language Model)
         self.llm = ChatGroq(
             api_key=GROQ_API_KEY, 
@@ -34,17 +138,38 @@ class AdvancedSQLPipeline:
             temperature=0  # Low temperature for consistent results
         )
         
+        # Generated SQL and its safety verdict keyed by (schema hash, normalized question);
+        # temperature=0 makes the LLM deterministic, so repeat questions can skip the call
+        self._sql_cache: Dict[Tuple[str, str], Tuple[str, bool]] = {}
+        
+        # Raw LLM responses, persisted across sessions
+        self._llm_cache = LLMCache()
+        
         # Get comprehensive database schema
-        self.schema = self._get_comprehensive_schema()
+        self._load_schema()
         print(f"✅ Found {len(self.schema)} tables with full schema information")
         print("🚀 Advanced Pipeline ready for complex queries!")
     
+    def _load_schema(self, refresh: bool = False):
+        """Load the schema and everything derived from it"""
+        try:
+            self.schema = self._get_comprehensive_schema(refresh=refresh)
+        finally:
+            # End the implicit transaction the inspector opened on our connection
+            self._conn.rollback()
+        
+        # The schema description only depends on the schema, so build it once
+        self._schema_description = self._build_schema_description()
+        self._schema_hash = hashlib.md5(self._schema_description.encode()).hexdigest()[:8]
+        self._schema_system_msg = SystemMessage(
+            content=_PROMPT_HEAD + self._schema_description + _PROMPT_RULES
+        )
+    
     def _create_db_connection(self):
-        """Create connection to MySQL database"""
-        connection_url = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
-        return create_engine(connection_url)
+        """Get the process-wide MySQL engine shared with db_utils/agent_utils"""
+        return get_engine()
     
-    def _get_comprehensive_schema(self) -> Dict[str, Dict[str, Any]]:
+    def _get_comprehensive_schema(self, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
         """
         Get comprehensive schema information including:
         - Table names
@@ -52,11 +177,122 @@ class AdvancedSQLPipeline:
         - Primary keys
         - Foreign keys
         - Indexes
+        
+        The result is pickled to disk keyed by database and table names, so
+        later runs skip the per-table inspector round-trips. The cached copy
+        is used for up to SCHEMA_CACHE_TTL seconds; pass refresh=True to
+        ignore it and inspect the database again.
         """
-        inspector = inspect(self.engine)
+        inspector = inspect(self._conn)
+        table_names = inspector.get_table_names()
+        cache_path = self._schema_cache_path(table_names)
+        
+        # Load the cached schema if we have a fresh one
+        if not refresh and is_cache_fresh(cache_path, SCHEMA_CACHE_TTL):
+            try:
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not read schema cache, re-inspecting: {e}")
+        
+        # MySQL can give us everything in three bulk queries instead of
+        # four inspector round-trips per table
+        if self.engine.dialect.name == 'mysql':
+            schema = self._get_mysql_schema_bulk(table_names)
+        else:
+            schema = self._get_schema_with_inspector(inspector, table_names)
+        
+        # Save for the next run (a failed write only costs us the cache)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump(schema, f)
+        except Exception as e:
+            print(f"⚠️ Could not write schema cache: {e}")
+        
+        return schema
+    
+    def _get_mysql_schema_bulk(self, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Build the same schema dict as the inspector from information_schema"""
+        params = {'db': MYSQL_DB}
+        wanted = set(table_names)  # information_schema also lists views
         schema = {}
         
-        for table_name in inspector.get_table_names():
+        # Columns, in table order
+        column_rows = self._conn.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_KEY "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = :db "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        ), params).fetchall()
+        
+        for table_name, rows in groupby(column_rows, key=itemgetter(0)):
+            if table_name not in wanted:
+                continue
+            column_info = {}
+            for _, col_name, col_type, is_nullable, default, col_key in rows:
+                column_info[col_name] = {
+                    'type': col_type.upper(),
+                    'nullable': is_nullable == 'YES',
+                    'default': default,
+                    'primary_key': col_key == 'PRI'
+                }
+            schema[table_name] = {
+                'columns': column_info,
+                'primary_keys': [],
+                'foreign_keys': [],
+                'indexes': [],
+                'column_names': list(column_info.keys())
+            }
+        
+        # Primary and foreign keys, one row per constrained column
+        key_rows = self._conn.execute(text(
+            "SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, "
+            "REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+            "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = :db "
+            "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"
+        ), params).fetchall()
+        
+        for (table_name, constraint), rows in groupby(key_rows, key=itemgetter(0, 1)):
+            if table_name not in schema:
+                continue
+            rows = list(rows)
+            if constraint == 'PRIMARY':
+                schema[table_name]['primary_keys'] = [row[2] for row in rows]
+            elif rows[0][4] is not None:
+                referred_schema = rows[0][3]
+                schema[table_name]['foreign_keys'].append({
+                    'name': constraint,
+                    'constrained_columns': [row[2] for row in rows],
+                    'referred_schema': None if referred_schema == MYSQL_DB else referred_schema,
+                    'referred_table': rows[0][4],
+                    'referred_columns': [row[5] for row in rows],
+                    'options': {}
+                })
+        
+        # Secondary indexes (the inspector leaves out the primary key too)
+        index_rows = self._conn.execute(text(
+            "SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE "
+            "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = :db AND INDEX_NAME <> 'PRIMARY' "
+            "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        ), params).fetchall()
+        
+        for (table_name, index_name), rows in groupby(index_rows, key=itemgetter(0, 1)):
+            if table_name not in schema:
+                continue
+            rows = list(rows)
+            schema[table_name]['indexes'].append({
+                'name': index_name,
+                'column_names': [row[2] for row in rows],
+                'unique': not int(rows[0][3])
+            })
+        
+        return schema
+    
+    def _get_schema_with_inspector(self, inspector, table_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Build the schema dict with per-table SQLAlchemy inspector calls"""
+        schema = {}
+        
+        for table_name in table_names:
             # Get detailed column information
             columns = inspector.get_columns(table_name)
             column_info = {}
@@ -89,6 +325,14 @@ class AdvancedSQLPipeline:
         
         return schema
     
+    def _schema_cache_path(self, table_names: List[str]) -> str:
+        """Build the cache file path for this database and set of tables"""
+        # The engine URL (without the password) tells databases apart even when
+        # MYSQL_DB isn't set, e.g. for a non-MySQL URL
+        database = self.engine.url.render_as_string(hide_password=True)
+        cache_key = hashlib.md5((database + ','.join(sorted(table_names))).encode()).hexdigest()
+        return os.path.join(CACHE_DIR, f"schema_{cache_key}.pkl")
+    
     def process_query(self, user_question: str) -> Dict[str, Any]:
         """
         Main method: Convert user question to advanced SQL and get results
@@ -101,104 +345,101 @@ class AdvancedSQLPipeline:
         print(f"\n📝 Processing: '{user_question}'")
         
         try:
-            # Generate advanced SQL using LLM
-            sql_query = self._generate_advanced_sql(user_question)
-            print(f"🔧 Generated SQL: {sql_query}")
-            
-            # Validate the SQL is safe
-            if not self._is_safe_sql(sql_query):
-                return self._error_response("Generated SQL failed safety check")
-            
-            print(f"🔧 Final SQL to execute: '{sql_query}'")
-            
-            # Execute the query
-            results = self._execute_query(sql_query)
-            
-            # Determine the main table(s) involved
-            main_tables = self._extract_main_tables(sql_query)
-            
-            return {
-                'success': True,
-                'user_question': user_question,
-                'target_table': ', '.join(main_tables) if main_tables else 'Multiple tables',
-                'sql_query': sql_query,
-                'results': results,
-                'result_count': len(results)
-            }
+            # Generate advanced SQL using LLM (safety is checked while cleaning)
+            sql_query, is_safe = self._generate_advanced_sql(user_question)
+            return self._run_generated_sql(user_question, sql_query, is_safe)
             
         except Exception as e:
             print(f"❌ Error: {e}")
             return self._error_response(str(e))
     
-    def _generate_advanced_sql(self, user_question: str) -> str:
-        """
-        Generate advanced SQL query using LLM with full schema context
-        This method can handle complex queries with JOINs, CTEs, etc.
-        """
-        # Create a comprehensive schema description for the LLM
-        schema_description = self._create_schema_description()
-        
-        prompt = f"""
-        You are an expert SQL developer for MySQL database. Generate a SQL query based on the user's question.
-        
-        User Question: "{user_question}"
-        
-        Database Schema:
-        {schema_description}
+    async def aprocess_query(self, user_question: str) -> Dict[str, Any]:
+        """Same as process_query, but awaits the LLM so several questions can run at once"""
+        print(f"\n📝 Processing: '{user_question}'")
         
-        Requirements:
-        1. Return ONLY the SQL query, no explanations
-        2. ALWAYS consult the schema above before generating SQL
-        3. If the requested column does not exist in the mentioned table, 
-        identify the correct table from the schema and JOIN using the foreign keys
-        If the user asks for "category" or any field not directly in the base table, 
-        look at the schema foreign keys to trace the correct relationship. 
-
-        For example:
-        - To get category from orders, you must JOIN orders → order_details → products → categories.
-        - Never assume a column exists directly in orders if the schema does not list it.
-        4. Use proper JOIN syntax when multiple tables are needed
-        5. Support CTEs (WITH clauses) if they make the query clearer
-        6. Support window functions if needed
-        7. Use proper table aliases for clarity
-        8. Handle complex WHERE conditions properly
-        9. Use appropriate aggregation functions
-        10. Start with SELECT statement
-        11. Do not add a semicolon at the end
-        12. Use MySQL syntax (NOT PostgreSQL)
-        13. When aggregating data across multiple tables (e.g., counting orders by category), 
-        avoid double-counting by using CTEs or DISTINCT as needed.
-        14. If an order may appear multiple times due to joins with order_details or products, 
-        use COUNT(DISTINCT order_id) or an intermediate CTE to ensure correct results.
-
+        try:
+            sql_query, is_safe = await self._agenerate_advanced_sql(user_question)
+            return self._run_generated_sql(user_question, sql_query, is_safe)
+            
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return self._error_response(str(e))
+    
+    async def aprocess_queries(self, questions: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Run several questions concurrently, at most max_concurrency LLM calls at a time (Groq rate limits)"""
+        return await gather_limited(self.aprocess_query, questions, max_concurrency)
+    
+    def _run_generated_sql(self, user_question: str, sql_query: str, is_safe: bool) -> Dict[str, Any]:
+        """Validate and execute generated SQL, building the result dict"""
+        print(f"🔧 Generated SQL: {sql_query}")
         
-        IMPORTANT: Use MySQL date functions:
-        - Instead of DATE_TRUNC('month', date) use: DATE_FORMAT(date, '%Y-%m-01')
-        - Instead of DATE_TRUNC('year', date) use: DATE_FORMAT(date, '%Y-01-01')
-        - For date arithmetic use: DATE_ADD(), DATE_SUB(), INTERVAL
-        - Use realistic date ranges: '1990-01-01' instead of '2020-01-01' for sample databases
-
-        When the query requires information across multiple tables, 
-        derive the JOINs from the foreign key relationships in the schema.
-        Do NOT assume a column exists in a table if the schema does not list it.
+        # Validate the SQL is safe
+        if not is_safe:
+            return self._error_response("Generated SQL failed safety check")
         
-        Examples of what you can generate:
-        - Simple queries: SELECT * FROM customers
-        - JOINs: SELECT c.name, o.order_date FROM customers c JOIN orders o ON c.id = o.customer_id
-        - CTEs: WITH recent_orders AS (SELECT * FROM orders WHERE order_date > '1990-01-01') SELECT * FROM recent_orders
-        - Window functions: SELECT *, ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY price) as rn FROM products
-        - Complex aggregations: SELECT category, COUNT(*), AVG(price) FROM products GROUP BY category HAVING COUNT(*) > 5
-        - Date grouping: SELECT DATE_FORMAT(order_date, '%Y-%m-01') as month, COUNT(*) FROM orders GROUP BY month
+        print(f"🔧 Final SQL to execute: '{sql_query}'")
         
-        SQL Query:"""
+        # Execute the query straight into a DataFrame; keep row dicts for display.
+        # NULLs go back to None so integer columns aren't shown as 5.0 / nan.
+        df = self._execute_query(sql_query)
+        results = df.astype(object).where(df.notna(), None).to_dict('records')
         
-        response = self.llm.invoke(prompt).content.strip()
+        # Determine the main table(s) involved
+        main_tables = self._extract_main_tables(sql_query)
         
-        # Clean and extract the SQL
-        sql = self._clean_advanced_sql(response)
-        return sql
+        return {
+            'success': True,
+            'user_question': user_question,
+            'target_table': ', '.join(main_tables) if main_tables else 'Multiple tables',
+            'sql_query': sql_query,
+            'results': results,
+            'dataframe': df,
+            'result_count': len(results)
+        }
+    
+    def _generate_advanced_sql(self, user_question: str) -> Tuple[str, bool]:
+        """
+        Generate advanced SQL query using LLM with full schema context
+        This method can handle complex queries with JOINs, CTEs, etc.
+        Returns the cleaned SQL and whether it passed the safety checks.
+        """
+        # Reuse SQL we already generated for the same question and schema
+        cache_key = self._sql_cache_key(user_question)
+        if cache_key in self._sql_cache:
+            print("⚡ Using cached SQL for this question")
+            return self._sql_cache[cache_key]
+        
+        response = self._llm_cache.invoke(self.llm, self._sql_prompt(user_question)).strip()
+        
+        # Clean and extract the SQL, checking its safety on the way
+        processed = self._process_sql(response)
+        self._sql_cache[cache_key] = processed
+        return processed
+    
+    async def _agenerate_advanced_sql(self, user_question: str) -> Tuple[str, bool]:
+        """Same as _generate_advanced_sql, but awaits the LLM"""
+        cache_key = self._sql_cache_key(user_question)
+        if cache_key in self._sql_cache:
+            print("⚡ Using cached SQL for this question")
+            return self._sql_cache[cache_key]
+        
+        response = (await self._llm_cache.ainvoke(self.llm, self._sql_prompt(user_question))).strip()
+        
+        processed = self._process_sql(response)
+        self._sql_cache[cache_key] = processed
+        return processed
+    
+    def _sql_cache_key(self, user_question: str) -> Tuple[str, str]:
+        return (self._schema_hash, ' '.join(user_question.lower().split()))
+    
+    def _sql_prompt(self, user_question: str) -> list:
+        """Messages for the LLM; the schema and instructions are prebuilt in _load_schema"""
+        return [
+            self._schema_system_msg,
+            HumanMessage(content=_QUESTION_HEAD + user_question + _QUESTION_TAIL)
+        ]
     
-    def _create_schema_description(self) -> str:
+    def _build_schema_description(self) -> str:
         """Create a comprehensive schema description for the LLM"""
         description = []
         
@@ -227,42 +468,41 @@ class AdvancedSQLPipeline:
         
         return '\n\n'.join(description)
     
-    def _clean_advanced_sql(self, sql: str) -> str:
-        """Clean up the generated advanced SQL query"""
-        print(f"🔍 Raw LLM response: '{sql}'")
+    def _process_sql(self, raw: str) -> Tuple[str, bool]:
+        """
+        Clean up the generated advanced SQL query and run the safety checks
+        on it, normalizing and uppercasing the string only once for both
+        """
+        print(f"🔍 Raw LLM response: '{raw}'")
         
         # Remove markdown formatting
-        sql = re.sub(r'```sql\n?|```\n?', '', sql)
+        sql = _RE_MD_FENCE.sub('', raw)
         
         # Extract SQL if it doesn't start with SELECT
-        if not sql.strip().upper().startswith('SELECT'):
+        if sql.lstrip()[:6].upper() != 'SELECT':
             sql = self._extract_sql_from_advanced_response(sql)
         
-        # Clean up whitespace and remove trailing semicolons
-        sql = sql.strip().rstrip(';')
-        
-        # Normalize whitespace
-        sql = ' '.join(sql.split())
+        # Normalize whitespace and remove trailing semicolons
+        sql = ' '.join(sql.split()).rstrip(';').rstrip()
         
         print(f"🧹 Cleaned SQL: '{sql}'")
-        return sql
+        return sql, self._is_safe_sql(sql, sql.upper())
     
     def _extract_sql_from_advanced_response(self, response: str) -> str:
         """Extract SQL from LLM response that might contain explanations"""
         
         # First, try to extract the complete SQL query
         # Look for SQL between markdown code blocks
-        sql_match = re.search(r'```(?:sql)?\s*\n?(.*?)\n?```', response, re.DOTALL | re.IGNORECASE)
+        sql_match = _RE_CODE_BLOCK.search(response)
         if sql_match:
             sql = sql_match.group(1).strip()
             print(f"🔍 Extracted from code blocks: '{sql}'")
             return sql
         
         # Check if the response is already pure SQL (contains SQL keywords)
-        response_upper = response.upper()
-        if any(keyword in response_upper for keyword in ['SELECT', 'WITH', 'FROM', 'JOIN']):
+        if _SQL_KW_RE.search(response) is not None:
             # Try to extract just the SQL part
-            sql_match = re.search(r'(SELECT\s+.+|WITH\s+.+)', response, re.IGNORECASE | re.DOTALL)
+            sql_match = _RE_SQL_START.search(response)
             if sql_match:
                 clean_response = sql_match.group(1).strip()
                 print(f"🔍 Extracted SQL from response: '{clean_response}'")
@@ -277,23 +517,25 @@ class AdvancedSQLPipeline:
         print(f"🔍 No SQL detected, returning original: '{response.strip()}'")
         return response.strip()
     
-    def _is_safe_sql(self, sql: str) -> bool:
+    def _is_safe_sql(self, sql: str, sql_upper: Optional[str] = None) -> bool:
         """
         Enhanced safety check for advanced SQL queries
+        
+        Pass sql_upper if the caller already has the stripped, uppercased SQL.
         """
-        sql_upper = sql.upper().strip()
+        if sql_upper is None:
+            sql_upper = sql.upper().strip()
         
         # Must start with SELECT, WITH, or be a valid CTE
         if not (sql_upper.startswith('SELECT') or sql_upper.startswith('WITH')):
             print("❌ SQL must start with SELECT or WITH")
             return False
         
-        # Check for dangerous operations
-        dangerous_keywords = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'CREATE', 'ALTER', 'TRUNCATE', 'EXEC', 'EXECUTE']
-        for keyword in dangerous_keywords:
-            if keyword in sql_upper:
-                print(f"❌ Dangerous keyword '{keyword}' found")
-                return False
+        # Check for dangerous operations (whole words, so UPDATED_AT is fine)
+        bad = _DANGEROUS.intersection(_TOKEN_RE.findall(sql_upper))
+        if bad:
+            print(f"❌ Dangerous keyword {sorted(bad)} found")
+            return False
         
         # Check for multiple statements (should be single query)
         if ';' in sql:
@@ -303,39 +545,39 @@ class AdvancedSQLPipeline:
         print("✅ SQL passed safety checks")
         return True
     
-    def _execute_query(self, sql: str) -> List[Dict[str, Any]]:
-        """Execute the SQL query and return results"""
+    def _execute_query(self, sql: str) -> pd.DataFrame:
+        """Execute the SQL query and return results as a DataFrame"""
         try:
-            with self.engine.connect() as connection:
-                result = connection.execute(text(sql))
-                columns = result.keys()
-                rows = result.fetchall()
-                
-                # Convert to list of dictionaries
-                results = []
-                for row in rows:
-                    row_dict = {}
-                    for i, col in enumerate(columns):
-                        row_dict[col] = row[i]
-                    results.append(row_dict)
-                
-                return results
-                
+            # Each query gets its own transaction on the shared connection,
+            # rolled back automatically if the query fails
+            with self._conn.begin():
+                # pandas builds the frame from the driver rows in one go
+                df = pd.read_sql_query(text(sql), self._conn)
         except Exception as e:
             print(f"❌ SQL execution failed: {e}")
             raise e
+        
+        # JOINs can return the same label twice (c.name, e.name); number the
+        # repeats so every column stays a single Series
+        df.columns = _dedupe_columns(df.columns)
+        return df
     
     def _extract_main_tables(self, sql: str) -> List[str]:
         """Extract the main tables involved in the query"""
-        # Simple regex to find table names after FROM and JOIN
-        table_pattern = r'(?:FROM|JOIN|LEFT\s+JOIN|RIGHT\s+JOIN|INNER\s+JOIN|FULL\s+JOIN)\s+(\w+)'
-        tables = re.findall(table_pattern, sql, re.IGNORECASE)
-        
-        # Remove duplicates and return
-        return list(set(tables))
+        # Simple regex to find table names after FROM and JOIN,
+        # de-duplicated in the order they first appear
+        return list(dict.fromkeys(_RE_TABLES.findall(sql)))
     
-    def show_schema(self):
-        """Display the database schema in a readable format"""
+    def show_schema(self, refresh: bool = False):
+        """Display the database schema in a readable format
+        
+        Args:
+            refresh: Re-inspect the database and overwrite the schema cache first
+        """
+        if refresh:
+            self._load_schema(refresh=True)
+            print(f"🔄 Schema refreshed: {len(self.schema)} tables")
+        
         print("\n📊 Database Schema:")
         print("=" * 60)
         
@@ -365,6 +607,7 @@ class AdvancedSQLPipeline:
             'target_table': '',
             'sql_query': '',
             'results': [],
+            'dataframe': None,
             'result_count': 0,
             'error': error_message
         }
@@ -5,8 +5,11 @@ from langchain_community.utilities.sql_database import SQLDatabase
 from config import GROQ_API_KEY
 from db_utils import get_engine
 
+# Built on first use; the engine, LLM and tools don't change within a process
+_AGENT = None
 
-def get_sql_agent():
+
+def _build_sql_agent():
     engine = get_engine()
     db = SQLDatabase(engine)
     llm = ChatGroq(model="Gemma2-9b-It", groq_api_key=GROQ_API_KEY)
@@ -16,4 +19,11 @@ def get_sql_agent():
         agent_type="openai-tools",
         verbose=True
     )
-    return agent
\ No newline at end of file
+    return agent
+
+
+def get_sql_agent():
+    global _AGENT
+    if _AGENT is None:
+        _AGENT = _build_sql_agent()
+    return _AGENT
@@ -0,0 +1,15 @@
+# async_utils.py - Helpers shared by the pipelines' async entry points
+
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+
+async def gather_limited(func: Callable[[Any], Awaitable[Any]], items: List[Any], max_concurrency: int = 8) -> List[Any]:
+    """Await func(item) for every item concurrently, at most max_concurrency at a time; results keep the input order"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+    
+    return await asyncio.gather(*(run(item) for item in items))
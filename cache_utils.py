@@ -0,0 +1,12 @@
+# cache_utils.py - Helpers shared by the on-disk caches
+
+import os
+import time
+
+
+def is_cache_fresh(cache_path: str, ttl: float) -> bool:
+    """Check a cache file exists and is younger than ttl seconds"""
+    try:
+        return time.time() - os.path.getmtime(cache_path) < ttl
+    except OSError:
+        return False
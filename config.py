@@ -7,4 +7,7 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 MYSQL_HOST = os.getenv('MYSQL_HOST')
 MYSQL_USER = os.getenv('MYSQL_USER')
 MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD')
-MYSQL_DB = os.getenv('MYSQL_DB')
\ No newline at end of file
+MYSQL_DB = os.getenv('MYSQL_DB')
+# Directory for everything the chatbot caches on disk (schemas, LLM
+# responses, the semantic cache)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".sql_chatbot_cache")
@@ -1,10 +1,20 @@
+from functools import lru_cache
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.engine import Engine
 from config import MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB
 
+@lru_cache(maxsize=1)
 def get_engine() -> Engine:
+    # One engine (and connection pool) per process, shared by every caller
     url = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
-    return create_engine(url)
+    return create_engine(
+        url,
+        pool_size=10,            # pipelines hold one connection each; leave room for the agent
+        max_overflow=20,
+        pool_pre_ping=True,      # drop dead connections on checkout
+        pool_recycle=3600,       # stay under MySQL's wait_timeout
+        query_cache_size=1200    # compiled-SQL cache; generated queries vary a lot
+    )
 
 def get_schema_info(engine: Engine):
     inspector = inspect(engine)
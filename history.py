@@ -1,12 +1,39 @@
+from collections import deque
+
+
 class ChatHistory:
-    def __init__(self):
-        self.history = []
+    def __init__(self, max_turns=200, max_analyzers=10):
+        # Bounded so long sessions don't grow memory forever
+        self.history = deque(maxlen=max_turns)
+        self.max_analyzers = max_analyzers
+        self._analyzers = {}
+        self._turns = 0
 
     def add(self, user, bot):
         self.history.append({"user": user, "bot": bot})
+        self._turns += 1
+
+    def add_analyzer(self, analyzer):
+        # Analyzers hold whole DataFrames, so only keep the most recent few,
+        # keyed by the turn they belong to
+        self._analyzers[self._turns - 1] = analyzer
+        while len(self._analyzers) > self.max_analyzers:
+            del self._analyzers[next(iter(self._analyzers))]
 
     def get(self):
         return self.history
 
+    def show_history(self):
+        if not self.history:
+            print("📭 No chat history yet.")
+            return
+        print("\n📚 Chat History:")
+        for i, entry in enumerate(self.history, 1):
+            bot = entry["bot"]
+            if isinstance(bot, dict):
+                bot = f"{bot.get('result_count', 0)} rows" if bot.get('success') else f"failed: {bot.get('error')}"
+            print(f"  {i}. {entry['user']} → {bot}")
+
     def clear(self):
-        self.history = []
\ No newline at end of file
+        self.history.clear()
+        self._analyzers.clear()
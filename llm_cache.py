@@ -0,0 +1,136 @@
+# llm_cache.py - Persistent cache for LLM responses
+
+import atexit
+import hashlib
+import os
+import shelve
+import time
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+from config import CACHE_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses")
+
+
+class LLMCache:
+    """
+    Cache of LLM responses keyed by a hash of the model name and prompt.
+
+    Responses are kept in a small in-memory LRU and in a shelve file on disk,
+    so an identical prompt skips the API call both later in this session and
+    in later sessions (until the entry is older than `ttl` seconds).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: int = 3600, max_memory_items: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._prune()
+        atexit.register(self._report)
+
+    def invoke(self, llm, prompt: Union[str, List]) -> str:
+        """
+        Return llm.invoke(prompt).content, from the cache when possible
+
+        `prompt` can be a string or a list of LangChain messages.
+        """
+        key = self._key(getattr(llm, 'model_name', ''), prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = llm.invoke(prompt).content
+        self._put(key, response)
+        return response
+
+    async def ainvoke(self, llm, prompt: Union[str, List]) -> str:
+        """Same as invoke(), but awaits llm.ainvoke on a miss"""
+        key = self._key(getattr(llm, 'model_name', ''), prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = (await llm.ainvoke(prompt)).content
+        self._put(key, response)
+        return response
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """Cached response for key (counting the hit or miss), or None"""
+        cached = self._get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        print("⚡ LLM cache hit")
+        return cached
+
+    def _key(self, model: str, prompt: Union[str, List]) -> str:
+        if not isinstance(prompt, str):
+            prompt = "\n".join(f"{message.type}: {message.content}" for message in prompt)
+        return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                with shelve.open(self.path) as db:
+                    entry = db.get(key)
+            except Exception as e:
+                print(f"⚠️ Could not read LLM cache: {e}")
+                return None
+            if entry is None:
+                return None
+
+        created_at, response = entry
+        if time.time() - created_at > self.ttl:
+            self._memory.pop(key, None)
+            self._delete(key)
+            return None
+
+        self._remember(key, entry)
+        return response
+
+    def _put(self, key: str, response: str):
+        entry = (time.time(), response)
+        self._remember(key, entry)
+        try:
+            with shelve.open(self.path) as db:
+                db[key] = entry
+        except Exception as e:
+            print(f"⚠️ Could not write LLM cache: {e}")
+
+    def _delete(self, key: str):
+        try:
+            with shelve.open(self.path) as db:
+                db.pop(key, None)
+        except Exception as e:
+            print(f"⚠️ Could not write LLM cache: {e}")
+    
+    def _prune(self):
+        """Drop expired entries from disk, so the shelf doesn't grow across sessions"""
+        cutoff = time.time() - self.ttl
+        try:
+            with shelve.open(self.path) as db:
+                expired = [key for key in db if db[key][0] < cutoff]
+                for key in expired:
+                    del db[key]
+        except Exception as e:
+            print(f"⚠️ Could not prune LLM cache: {e}")
+    
+    def _remember(self, key: str, entry):
+        """Store in the in-memory LRU, evicting the least recently used entry"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _report(self):
+        if self.hits or self.misses:
+            print(f"📦 LLM cache: {self.hits} hits, {self.misses} misses")
@@ -0,0 +1,84 @@
+# semantic_cache.py - Question -> SQL cache so rephrased questions skip the LLM
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+from config import CACHE_DIR
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "semantic_cache.sqlite3")
+
+# Words that don't change which rows a question asks for
+_FILLER_WORDS = frozenset({
+    'a', 'an', 'the', 'me', 'my', 'us', 'please', 'all', 'of', 'can', 'could',
+    'you', 'would', 'i', 'want', 'to', 'see', 'give', 'just'
+})
+# Words, plus comparison operators and minus signs: "amount > 100" and
+# "amount < 100" must not share a cache entry
+_TOKEN_RE = re.compile(r'\w+|<>|[<>!=]=|[<>=]|-(?=\d)')
+
+
+@lru_cache(maxsize=1024)
+def normalize_question(question: str) -> str:
+    """Reduce a question to its meaningful words, e.g. "Show me the customers!" -> "show customers" """
+    words = _TOKEN_RE.findall(question.lower())
+    return ' '.join(word for word in words if word not in _FILLER_WORDS)
+
+
+@lru_cache(maxsize=1024)
+def question_key(question: str) -> str:
+    """Stable SHA-256 key of the normalized question, used as the stored key"""
+    return hashlib.sha256(normalize_question(question).encode()).hexdigest()
+
+
+class SemanticCache:
+    """
+    Remembers which table and SQL answered a question.
+
+    Questions are matched on their normalized form, so small phrasing changes
+    ("show me the customers" / "show all customers") hit the same entry and
+    skip both LLM calls. Only the SQL is cached - it is still run against the
+    database each time, so results are never stale. Entries expire after `ttl`
+    seconds and are separated by `namespace` (e.g. a schema fingerprint).
+    """
+
+    def __init__(self, namespace: str, path: str = DEFAULT_DB_PATH, ttl: int = 7 * 24 * 60 * 60):
+        self.namespace = namespace
+        self.ttl = ttl
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " namespace TEXT NOT NULL,"
+            " question_key TEXT NOT NULL,"
+            " question TEXT NOT NULL,"
+            " target_table TEXT NOT NULL,"
+            " sql TEXT NOT NULL,"
+            " created_at INTEGER NOT NULL,"
+            " PRIMARY KEY (namespace, question_key))"
+        )
+        self.conn.commit()
+
+    def lookup(self, question: str) -> Optional[Dict[str, str]]:
+        """Return {'target_table', 'sql_query'} for a matching fresh entry, or None"""
+        row = self.conn.execute(
+            "SELECT target_table, sql, created_at FROM queries WHERE namespace = ? AND question_key = ?",
+            (self.namespace, question_key(question))
+        ).fetchone()
+
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        return {'target_table': row[0], 'sql_query': row[1]}
+
+    def store(self, question: str, target_table: str, sql_query: str):
+        """Remember the table and SQL that answered a question"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, question_key(question), question, target_table, sql_query, int(time.time()))
+        )
+        self.conn.commit()
@@ -1,51 +1,57 @@
  # simple_main.py - Step 1: Testing Single Table Queries
 
+import sys
+from operator import itemgetter
 from simple_pipeline import SimpleSQLPipeline
 
 
 def display_results(result):
     """Display results in a nice format"""
-    print("\n" + "="*60)
+    # Build the whole block and write it once instead of printing line by line
+    lines = ["\n" + "="*60]
 
     if result['success']:
-        print("✅ SUCCESS")
-        print(f"Question: {result['user_question']}")
-        print(f"Table: {result['target_table']}")
-        print(f"SQL: {result['sql_query']}")
-        print(f"Found: {result['result_count']} rows")
+        lines.append("✅ SUCCESS")
+        lines.append(f"Question: {result['user_question']}")
+        lines.append(f"Table: {result['target_table']}")
+        lines.append(f"SQL: {result['sql_query']}")
+        lines.append(f"Found: {result['result_count']} rows")
 
         # Show first few results
         if result['results']:
-            print("\n📊 Results:")
-            print("-" * 40)
+            lines.append("\n📊 Results:")
+            lines.append("-" * 40)
 
             # Show headers
             headers = list(result['results'][0].keys())
-            print(" | ".join(headers))
-            print("-" * 40)
+            lines.append(" | ".join(headers))
+            lines.append("-" * 40)
 
-            # Show first 5 rows
-            for i, row in enumerate(result['results'][:5]):
-                values = [str(row[col]) for col in headers]
-                print(" | ".join(values))
+            # Show first 5 rows (itemgetter returns a bare value for one column)
+            get_values = itemgetter(*headers)
+            single_column = len(headers) == 1
+            for row in result['results'][:5]:
+                values = (get_values(row),) if single_column else get_values(row)
+                lines.append(" | ".join(map(str, values)))
 
             if len(result['results']) > 5:
-                print(f"... and {len(result['results']) - 5} more rows")
+                lines.append(f"... and {len(result['results']) - 5} more rows")
         else:
-            print("No data found")
+            lines.append("No data found")
 
     else:
-        print("❌ FAILED")
-        print(f"Error: {result['error']}")
+        lines.append("❌ FAILED")
+        lines.append(f"Error: {result['error']}")
 
-    print("="*60)
+    lines.append("="*60)
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
     """Simple main function for testing"""
     print("🚀 Welcome to Simple SQL Pipeline - Step 1!")
     print("This version handles basic single-table queries.")
-    print("Type 'exit' to quit, 'schema' to see tables.\n")
+    print("Type 'exit' to quit, 'schema' to see tables, 'schema refresh' to re-read them.\n")
 
     # Initialize pipeline
     try:
@@ -65,6 +71,11 @@ def main():
             pipeline.show_schema()
             continue
 
+        if user_input.lower() == 'schema refresh':
+            pipeline.refresh_schema()
+            pipeline.show_schema()
+            continue
+
         if not user_input:
             continue
 
@@ -1,10 +1,156 @@
 # simple_pipeline.py - Step 1: Single Table Queries
 
 from langchain_groq import ChatGroq
-from sqlalchemy import create_engine, text, inspect
-from config import GROQ_API_KEY, MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import DBAPIError
+from config import GROQ_API_KEY, MYSQL_HOST, MYSQL_DB, CACHE_DIR
+from db_utils import get_engine
+from async_utils import gather_limited
+from cache_utils import is_cache_fresh
+from semantic_cache import SemanticCache, normalize_question
+from sqlglot import exp
+import orjson
+import sqlglot
+import asyncio
+import atexit
+import hashlib
+import json
+import os
 import re
-from typing import List, Dict, Any
+from functools import cached_property
+from typing import List, Dict, Any, Mapping, Optional
+
+# The table -> columns map is saved to CACHE_DIR between runs
+SCHEMA_CACHE_TTL = 60 * 60  # seconds before the saved schema is reflected again
+
+# Regexes used on every query, compiled once at import
+# The SELECT statement in an LLM response: from SELECT to the end of the
+# statement (a semicolon, the closing markdown fence or a blank line)
+# The query in an LLM response: the body of a ```sql fence if there is one,
+# otherwise the first line that starts with SELECT or WITH (in capitals, so
+# prose like "To select all customers" isn't mistaken for it)
+_FENCED_RE = re.compile(r'```(?:sql)?[ \t]*\n?(.*?)```', re.IGNORECASE | re.DOTALL)
+_STATEMENT_START_RE = re.compile(r'^[ \t]*(?:SELECT|WITH)\b', re.MULTILINE)
+_BLANK_LINE_RE = re.compile(r'\n[ \t]*\n')
+_WORD_RE = re.compile(r'\w+')
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+# Prompts. Instructions and schema go first and the question last, so the
+# start of every prompt is identical across questions (providers with prefix
+# caching can reuse it); the schema parts are filled in once per schema.
+_PLAN_PROMPT_HEAD = """
+You are a database expert. Pick the one table the question is about and write a SQL query for it.
+
+Tables and columns:
+"""
+
+_PLAN_PROMPT_RULES = """
+
+Rules:
+- Return ONLY a JSON object: {"table": "<table name>", "sql": "<query>"}
+- If no table matches well, use "UNKNOWN" as the table
+- The query starts with SELECT, uses single quotes for strings and has no semicolon
+
+Example:
+{"table": "customers", "sql": "SELECT first_name, last_name FROM customers WHERE city = 'NYC'"}
+
+Question: \""""
+
+_PLAN_PROMPT_TAIL = '"\n\nJSON:'
+
+_TABLE_PROMPT_HEAD = """
+You are a database expert. Look at the user question and identify which table they're asking about.
+
+Available tables: """
+
+_TABLE_PROMPT_RULES = """
+
+Return ONLY the table name that best matches the question.
+If no table matches well, return "UNKNOWN".
+
+Examples:
+- "show me customers" → customers
+- "list all products" → products
+- "how many orders" → orders
+
+User question: \""""
+
+_TABLE_PROMPT_TAIL = '"\n\nTable name:'
+
+_SQL_PROMPT_HEAD = """
+You must return ONLY a SQL query. No explanations. No text before or after.
+
+"""
+
+_SQL_PROMPT_RULES = """
+
+Rules:
+- Start immediately with SELECT
+- Use single quotes for strings
+- One line if possible
+- No semicolon at end
+
+Examples:
+SELECT * FROM customers
+SELECT first_name, last_name FROM customers WHERE city = 'NYC'
+SELECT CONCAT(first_name, ' ', last_name) AS full_name FROM customers
+SELECT COUNT(*) FROM customers WHERE status = 'active'
+
+Question: \""""
+
+_SQL_PROMPT_TAIL = '"\n\nQuery:'
+
+# Questions that are just "<verb> <table>" once filler words are dropped
+# ("show me all customers", "how many orders") are answered without the LLM
+_TEMPLATES = {
+    'show': 'SELECT * FROM {}',
+    'list': 'SELECT * FROM {}',
+    'get': 'SELECT * FROM {}',
+    'count': 'SELECT COUNT(*) FROM {}',
+    'how many': 'SELECT COUNT(*) FROM {}',
+}
+
+# Statements a generated query must never contain
+_WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Drop, exp.Create, exp.Alter, exp.TruncateTable, exp.Command)
+
+
+def _extract_sql(response: str) -> str:
+    """
+    The SQL statement in an LLM response, with its whitespace collapsed
+    
+    The statement ends at a semicolon or a blank line outside quotes, or at
+    the end of the response / code fence.
+    """
+    fenced = _FENCED_RE.search(response)
+    text = fenced.group(1) if fenced else response
+    
+    match = _STATEMENT_START_RE.search(text)
+    start = match.start() if match else 0
+    
+    # Walk the statement so a ';' or blank line inside a string literal doesn't end it
+    quote = None
+    end = start
+    while end < len(text):
+        char = text[end]
+        if quote:
+            if char == '\\':
+                end += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char == ';' or _BLANK_LINE_RE.match(text, end):
+            break
+        end += 1
+    
+    return ' '.join(text[start:end].split()).rstrip(']').rstrip()
+
+
+def _json_default(value):
+    # orjson handles dicts, lists, numbers, strings and datetimes itself;
+    # rows are RowMappings, and DECIMAL columns come back as Decimal
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
 
 
 class SimpleSQLPipeline:
@@ -27,29 +173,100 @@ class SimpleSQLPipeline:
             temperature=0  # Low temperature for consistent results
         )
         
-        # Get database schema (table and column information)
-        self.schema = self._get_database_schema()
-        print(f"✅ Found {len(self.schema)} tables in database")
+        # The database schema (table and column information) is loaded on
+        # first use, so starting up doesn't touch the database
         print("🚀 Pipeline ready!")
     
+    @cached_property
+    def schema(self) -> Dict[str, List[str]]:
+        """Table name -> column names"""
+        schema = self._get_database_schema()
+        print(f"✅ Found {len(schema)} tables in database")
+        return schema
+    
+    @cached_property
+    def _conn(self):
+        # One long-lived connection instead of a pool checkout per query
+        conn = self.engine.connect()
+        atexit.register(conn.close)
+        return conn
+    
+    @cached_property
+    def _inspector(self):
+        # One inspector, so its reflection cache lasts as long as the schema
+        return inspect(self.engine)
+    
+    @cached_property
+    def _table_index(self) -> Dict[str, str]:
+        # Lowercased table name -> table, for matching words in the question
+        return {table.lower(): table for table in self.schema}
+    
+    @cached_property
+    def _semantic_cache(self) -> SemanticCache:
+        # Table + SQL for questions we've answered before, per schema version
+        schema_fingerprint = hashlib.md5(repr(sorted(self.schema.items())).encode()).hexdigest()
+        return SemanticCache(namespace=schema_fingerprint)
+    
+    @cached_property
+    def _plan_prompt_prefix(self) -> str:
+        tables = '\n'.join(f"- {table}: {', '.join(columns)}" for table, columns in self.schema.items())
+        return _PLAN_PROMPT_HEAD + tables + _PLAN_PROMPT_RULES
+    
+    @cached_property
+    def _table_prompt_prefix(self) -> str:
+        return _TABLE_PROMPT_HEAD + str(list(self.schema)) + _TABLE_PROMPT_RULES
+    
+    @cached_property
+    def _sql_prompt_prefixes(self) -> Dict[str, str]:
+        return {
+            table: f"{_SQL_PROMPT_HEAD}Table: {table}\nColumns: {columns}{_SQL_PROMPT_RULES}"
+            for table, columns in self.schema.items()
+        }
+    
+    def refresh_schema(self):
+        """Reflect the database again, ignoring and overwriting the saved schema"""
+        for name in ('_inspector', '_table_index', '_semantic_cache',
+                     '_plan_prompt_prefix', '_table_prompt_prefix', '_sql_prompt_prefixes'):
+            self.__dict__.pop(name, None)
+        self.schema = self._get_database_schema(refresh=True)
+        print(f"🔄 Schema refreshed: {len(self.schema)} tables")
+    
     def _create_db_connection(self):
-        """Create connection to MySQL database"""
-        connection_url = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
-        return create_engine(connection_url)
+        """Get the shared MySQL engine (pooled, with pre-ping and recycling)"""
+        return get_engine()
     
-    def _get_database_schema(self) -> Dict[str, List[str]]:
+    def _get_database_schema(self, refresh: bool = False) -> Dict[str, List[str]]:
         """
         Get basic schema information: which tables exist and their columns
         This is simpler than the complex version - just table names and columns
+        
+        The result is saved as JSON per host and database and reused for up
+        to SCHEMA_CACHE_TTL seconds; pass refresh=True to reflect it again.
         """
-        inspector = inspect(self.engine)
-        schema = {}
+        cache_key = hashlib.sha1(f"{MYSQL_HOST}/{MYSQL_DB}".encode()).hexdigest()
+        cache_path = os.path.join(CACHE_DIR, f"simple_schema_{cache_key}.json")
+        
+        # Use the saved schema if it's fresh
+        if not refresh and is_cache_fresh(cache_path, SCHEMA_CACHE_TTL):
+            try:
+                with open(cache_path) as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not read schema cache, reflecting again: {e}")
+        
+        # Columns for every table in one reflection query, keyed by (schema, table)
+        schema = {
+            table_name: [col['name'] for col in columns]
+            for (_, table_name), columns in self._inspector.get_multi_columns().items()
+        }
         
-        for table_name in inspector.get_table_names():
-            # Get column names for each table
-            columns = inspector.get_columns(table_name)
-            column_names = [col['name'] for col in columns]
-            schema[table_name] = column_names
+        # Save for the next run (a failed write only costs us the cache)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(schema, f)
+        except Exception as e:
+            print(f"⚠️ Could not write schema cache: {e}")
         
         return schema
     
@@ -59,240 +276,214 @@ class SimpleSQLPipeline:
         
         Steps:
         1. Identify which table the user is asking about
-        2. Generate SQL query using LLM
+        2. Generate SQL query using LLM (steps 1 and 2 share one LLM call,
+           or none for plain "show <table>" / "count <table>" questions)
         3. Clean and validate the SQL
         4. Execute query and return results
         """
         print(f"\n📝 Processing: '{user_question}'")
         
         try:
-            # Step 1: Find the right table
-            target_table = self._identify_table(user_question)
-            if not target_table:
-                return self._error_response("Could not identify which table you're asking about")
-            
-            print(f"🎯 Target table: {target_table}")
+            # Skip both LLM steps if we've answered this (or a reworded) question
+            cached = self._semantic_cache.lookup(user_question)
             
-            # Step 2: Generate SQL using LLM
-            sql_query = self._generate_sql(user_question, target_table)
-            print(f"🔧 Generated SQL: {sql_query}")
-            
-            # Step 3: Validate the SQL is safe
-            if not self._is_safe_sql(sql_query):
-                return self._error_response("Generated SQL failed safety check")
-            
-            print(f"🔧 Final SQL to execute: '{sql_query}'")
+            # Steps 1 + 2 from a template, or in one LLM call
+            planned = None if cached else (
+                self._template_sql(user_question) or self._plan_and_generate(user_question)
+            )
+            return self._answer(user_question, cached, planned)
             
-            # Step 4: Execute the query
-            results = self._execute_query(sql_query)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return self._error_response(str(e))
+    
+    def process_query_json(self, user_question: str) -> bytes:
+        """process_query, serialized to JSON bytes (e.g. for an HTTP response)"""
+        return orjson.dumps(self.process_query(user_question), default=_json_default)
+    
+    async def aprocess_query(self, user_question: str) -> Dict[str, Any]:
+        """Same as process_query, but awaits the LLM so several questions can run at once"""
+        print(f"\n📝 Processing: '{user_question}'")
+        
+        try:
+            cached = self._semantic_cache.lookup(user_question)
             
-            return {
-                'success': True,
-                'user_question': user_question,
-                'target_table': target_table,
-                'sql_query': sql_query,
-                'results': results,
-                'result_count': len(results)
-            }
+            planned = None if cached else self._template_sql(user_question)
+            if not cached and not planned:
+                response = await self.llm.ainvoke(self._plan_prompt(user_question))
+                planned = self._parse_plan(user_question, response.content)
+                
+                # Two separate LLM calls if the combined answer can't be parsed,
+                # awaited here so _answer doesn't block the event loop on them
+                if not planned:
+                    target_table = await self._aidentify_table(user_question)
+                    sql_query = await self._agenerate_sql(user_question, target_table) if target_table else None
+                    planned = (target_table, sql_query)
+            return self._answer(user_question, cached, planned)
             
         except Exception as e:
             print(f"❌ Error: {e}")
             return self._error_response(str(e))
     
-    def _identify_table(self, user_question: str) -> str:
-        """
-        Step 1: Figure out which table the user is asking about
-        This is the simplest approach - ask the LLM to pick one table
-        """
-        available_tables = list(self.schema.keys())
-        
-        prompt = f"""
-        You are a database expert. Look at this user question and identify which table they're asking about.
-        
-        User question: "{user_question}"
+    async def aprocess_queries(self, questions: List[str], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Run several questions concurrently, at most max_concurrency LLM calls at a time (Groq rate limits)"""
+        return await gather_limited(self.aprocess_query, questions, max_concurrency)
+    
+    def _answer(self, user_question: str, cached: Optional[Dict[str, str]], planned) -> Dict[str, Any]:
+        """Steps 3 + 4 once we have a cached or planned table and SQL"""
+        if cached:
+            target_table, sql_query = cached['target_table'], cached['sql_query']
+            print(f"⚡ Reusing SQL from a previous question on {target_table}")
+        else:
+            # Two separate LLM calls only if the combined answer can't be parsed
+            if planned:
+                target_table, sql_query = planned
+            else:
+                target_table = self._identify_table(user_question)
+                sql_query = None
+            
+            if not target_table:
+                return self._error_response("Could not identify which table you're asking about")
+            
+            print(f"🎯 Target table: {target_table}")
+            
+            if sql_query is None:
+                sql_query = self._generate_sql(user_question, target_table)
+            print(f"🔧 Generated SQL: {sql_query}")
         
-        Available tables: {available_tables}
+        # Step 3: Validate the SQL is safe
+        if not self._is_safe_sql(sql_query):
+            return self._error_response("Generated SQL failed safety check")
         
-        Return ONLY the table name that best matches the question. 
-        If no table matches well, return "UNKNOWN".
+        print(f"🔧 Final SQL to execute: '{sql_query}'")
         
-        Examples:
-        - "show me customers" → customers
-        - "list all products" → products  
-        - "how many orders" → orders
+        # Step 4: Execute the query
+        results = self._execute_query(sql_query)
         
-        Table name:"""
+        # Only cache SQL that actually ran
+        if not cached:
+            self._semantic_cache.store(user_question, target_table, sql_query)
         
-        response = self.llm.invoke(prompt).content.strip()
+        return {
+            'success': True,
+            'user_question': user_question,
+            'target_table': target_table,
+            'sql_query': sql_query,
+            'results': results,
+            'result_count': len(results)
+        }
+    
+    def _template_sql(self, user_question: str):
+        """(table, sql) for a "<verb> <table>" question, or None if it needs the LLM"""
+        verb, _, word = normalize_question(user_question).rpartition(' ')
+        template = _TEMPLATES.get(verb)
+        table = self._table_for_word(word) if template else None
+        if table is None:
+            return None
+        
+        print("⚡ Simple question, SQL built from a template")
+        return table, template.format(table)
+    
+    def _plan_and_generate(self, user_question: str):
+        """
+        Steps 1 + 2 together: ask the LLM for the table and the SQL in one call
         
+        Returns (table, sql), with table None if it isn't a real table, or
+        None if the response wasn't the JSON we asked for.
+        """
+        response = self.llm.invoke(self._plan_prompt(user_question)).content
+        return self._parse_plan(user_question, response)
+    
+    def _plan_prompt(self, user_question: str) -> str:
+        """Prompt asking for the table and the SQL as one JSON object"""
+        return self._plan_prompt_prefix + user_question + _PLAN_PROMPT_TAIL
+    
+    def _parse_plan(self, user_question: str, response: str):
+        """Read (table, sql) out of the combined response, or None if it isn't valid JSON"""
+        match = _JSON_OBJECT_RE.search(response)
+        try:
+            plan = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            plan = None
+        if not isinstance(plan, dict) or not isinstance(plan.get('sql'), str):
+            print("⚠️ Could not parse combined response, falling back to two steps")
+            return None
+        
+        table = self._table_index.get(str(plan.get('table', '')).lower()) or self._table_from_words(user_question)
+        return table, self._clean_sql(plan['sql'])
+    
+    def _identify_table(self, user_question: str) -> str:
+        """
+        Step 1: Figure out which table the user is asking about
+        This is the simplest approach - ask the LLM to pick one table
+        """
+        response = self.llm.invoke(self._table_prompt(user_question)).content
+        return self._parse_table(user_question, response)
+    
+    async def _aidentify_table(self, user_question: str) -> str:
+        """Same as _identify_table, but awaits the LLM"""
+        response = await self.llm.ainvoke(self._table_prompt(user_question))
+        return self._parse_table(user_question, response.content)
+    
+    def _table_prompt(self, user_question: str) -> str:
+        return self._table_prompt_prefix + user_question + _TABLE_PROMPT_TAIL
+    
+    def _parse_table(self, user_question: str, response: str) -> str:
+        """The real table the response names, or one named in the question"""
         # Clean the response and validate it's a real table
-        table_name = response.lower().strip()
-        if table_name in available_tables:
+        table_name = self._table_index.get(response.lower().strip())
+        if table_name:
             return table_name
         
-        # Fallback: check if any table name appears in the question
-        question_lower = user_question.lower()
-        for table in available_tables:
-            if table.lower() in question_lower:
+        return self._table_from_words(user_question)
+    
+    def _table_from_words(self, user_question: str) -> str:
+        """Fallback: check if any word in the question names a table"""
+        for word in _WORD_RE.findall(user_question.lower()):
+            table = self._table_for_word(word)
+            if table is not None:
                 return table
         
         return None
     
+    def _table_for_word(self, word: str) -> Optional[str]:
+        """The table a lowercase word names, also trying it without a plural 's' (customers -> customer)"""
+        table = self._table_index.get(word)
+        if table is None and word.endswith('s'):
+            table = self._table_index.get(word[:-1])
+        return table
+    
     def _generate_sql(self, user_question: str, target_table: str) -> str:
         """
         Step 2: Generate SQL query for the identified table
         We give the LLM the table structure and ask for SQL
         """
-        table_columns = self.schema[target_table]
-        
-        prompt = f"""
-        You must return ONLY a SQL query. No explanations. No text before or after.
-        
-        Question: "{user_question}"
-        Table: {target_table}
-        Columns: {table_columns}
-        
-        Rules:
-        - Start immediately with SELECT
-        - Use single quotes for strings
-        - One line if possible
-        - No semicolon at end
-        
-        Examples:
-        SELECT * FROM customers
-        SELECT first_name, last_name FROM customers WHERE city = 'NYC'
-        SELECT CONCAT(first_name, ' ', last_name) AS full_name FROM customers
-        SELECT COUNT(*) FROM customers WHERE status = 'active'
-        
-        Query for "{user_question}":"""
-        
-        response = self.llm.invoke(prompt).content.strip()
+        response = self.llm.invoke(self._sql_prompt(user_question, target_table)).content.strip()
         
-        # If the LLM still adds explanation, use a simple extraction
-        if not response.upper().strip().startswith('SELECT'):
-            # Find the SELECT statement in the response
-            lines = response.split('\n')
-            for line in lines:
-                if line.strip().upper().startswith('SELECT'):
-                    response = line.strip()
-                    break
-        
-        # Clean up the SQL
-        sql = self._clean_sql(response)
-        return sql
+        # Clean up the SQL (this also drops any explanation around it)
+        return self._clean_sql(response)
+    
+    async def _agenerate_sql(self, user_question: str, target_table: str) -> str:
+        """Same as _generate_sql, but awaits the LLM"""
+        response = await self.llm.ainvoke(self._sql_prompt(user_question, target_table))
+        return self._clean_sql(response.content.strip())
+    
+    def _sql_prompt(self, user_question: str, target_table: str) -> str:
+        return self._sql_prompt_prefixes[target_table] + user_question + _SQL_PROMPT_TAIL
     
     def _clean_sql(self, sql: str) -> str:
         """Clean up the generated SQL query and extract just the SQL part"""
         print(f"🔍 Raw LLM response: '{sql}'")
         
-        # Remove markdown formatting first
-        sql = re.sub(r'```sql\n?|```\n?', '', sql)
+        # Fix common quote issues in SQL first, so the curly quotes count as quotes
+        sql = sql.replace('‘', "'").replace('’', "'")
         
-        # Simple approach: if it doesn't start with SELECT, find the SELECT line
-        if not sql.strip().upper().startswith('SELECT'):
-            print("🔧 Response doesn't start with SELECT, extracting...")
-            sql_extracted = self._extract_sql_from_response(sql)
-        else:
-            sql_extracted = sql.strip()
-        
-        # Remove extra whitespace and trailing semicolons
-        sql_extracted = sql_extracted.strip().rstrip(';')
-        sql_extracted = sql_extracted.rstrip(']')
-        
-        # Remove any remaining explanation text that might be at the end
-        # Split by newlines and take only the SQL part
-        lines = sql_extracted.split('\n')
-        sql_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                # If line looks like SQL (has SQL keywords), keep it
-                if (line.upper().startswith('SELECT') or 
-                    any(keyword in line.upper() for keyword in ['FROM', 'WHERE', 'GROUP BY', 'ORDER BY', 'HAVING', 'LIMIT']) or
-                    'CONCAT(' in line.upper() or
-                    line.endswith(',') or
-                    line.startswith('AND') or line.startswith('OR')):
-                    sql_lines.append(line)
-                else:
-                    # This doesn't look like SQL, stop here
-                    break
-        
-        if sql_lines:
-            sql_extracted = ' '.join(sql_lines)
-        
-        # Fix common quote issues in SQL
-        sql_extracted = sql_extracted.replace(''', "'").replace(''', "'")
+        # Take just the statement, with its whitespace collapsed
+        sql_extracted = _extract_sql(sql)
         
         print(f"🧹 Cleaned SQL: '{sql_extracted}'")
         return sql_extracted
     
-    def _extract_sql_from_response(self, response: str) -> str:
-        """Extract the actual SQL query from LLM response that might have explanatory text"""
-        
-        # Method 1: Look for SELECT and extract everything from there until end of SQL
-        lines = response.strip().split('\n')
-        sql_lines = []
-        found_select = False
-        
-        for line in lines:
-            line_stripped = line.strip()
-            
-            # Skip empty lines before finding SELECT
-            if not found_select and not line_stripped:
-                continue
-                
-            # Look for SELECT statement
-            if not found_select and line_stripped.upper().startswith('SELECT'):
-                found_select = True
-                sql_lines.append(line_stripped)
-                continue
-            
-            # If we found SELECT, keep adding lines that look like SQL
-            if found_select:
-                if line_stripped:
-                    # Check if this looks like SQL (contains SQL keywords or continues previous line)
-                    sql_keywords = ['FROM', 'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'AS', 'AND', 'OR']
-                    if (any(keyword in line_stripped.upper() for keyword in sql_keywords) or 
-                        line_stripped.endswith(',') or 
-                        line_stripped.startswith('(') or 
-                        sql_lines[-1].endswith(',')):
-                        sql_lines.append(line_stripped)
-                    else:
-                        # This line doesn't look like SQL, stop here
-                        break
-                else:
-                    # Empty line might indicate end of SQL
-                    break
-        
-        if sql_lines:
-            result = ' '.join(sql_lines)
-            print(f"🔍 Method 1 extracted: '{result}'")
-            return result
-        
-        # Method 2: Use regex to find SELECT statement
-        # Match SELECT ... FROM ... and optional WHERE/GROUP BY/ORDER BY
-        pattern = r'SELECT\s+.+?FROM\s+\w+(?:\s+(?:WHERE|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT)\s+.+?)*'
-        match = re.search(pattern, response, re.IGNORECASE | re.DOTALL)
-        
-        if match:
-            result = match.group(0).strip()
-            # Clean up whitespace
-            result = ' '.join(result.split())
-            print(f"🔍 Method 2 extracted: '{result}'")
-            return result
-        
-        # Method 3: Last resort - find any line with SELECT and FROM
-        for line in lines:
-            line_clean = ' '.join(line.split())  # Normalize whitespace
-            if 'SELECT' in line_clean.upper() and 'FROM' in line_clean.upper():
-                print(f"🔍 Method 3 extracted: '{line_clean}'")
-                return line_clean
-        
-        # If all else fails, return the original (this shouldn't happen with good prompts)
-        print("⚠️ Could not extract SQL, returning original response")
-        return response.strip()
-    
     def _is_safe_sql(self, sql: str) -> bool:
         """
         Step 3: Enhanced safety check - make sure it's a SELECT query
@@ -304,82 +495,78 @@ class SimpleSQLPipeline:
         
         # Clean up the SQL for checking (remove extra spaces, newlines)
         sql_clean = ' '.join(sql.split())
-        sql_upper = sql_clean.upper().strip()
         
         print(f"🔍 Checking SQL: {sql_clean}")
         
-        # Must contain SELECT somewhere near the beginning
-        if not sql_upper.startswith('SELECT'):
-            # Maybe there's some whitespace or other characters, let's be more flexible
-            if 'SELECT' not in sql_upper[:20]:  # SELECT should be in first 20 characters
-                print("❌ SQL must start with SELECT")
-                print(f"   First 20 chars: '{sql_upper[:20]}'")
-                return False
-        
-        # Check for dangerous keywords
-        dangerous_words = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 'TRUNCATE', 'EXEC']
-        for word in dangerous_words:
-            if word in sql_upper:
-                print(f"❌ Dangerous keyword found: {word}")
-                return False
-        
-        # Basic quote balance check (only for single quotes in string literals)
-        # Count single quotes that are likely string delimiters
-        quote_count = 0
-        in_string = False
-        for i, char in enumerate(sql):
-            if char == "'" and (i == 0 or sql[i-1] != "\\"):  # Not escaped quote
-                quote_count += 1
-        
-        if quote_count % 2 != 0:
-            print("❌ Unbalanced single quotes in SQL")
-            print(f"   Found {quote_count} single quotes")
+        # Parse it properly instead of scanning for keywords: unbalanced quotes
+        # or parentheses fail here, and a column like DELETED isn't a DELETE
+        try:
+            statements = sqlglot.parse(sql, read='mysql')
+        except sqlglot.errors.SqlglotError as e:
+            print(f"❌ SQL could not be parsed: {e}")
             return False
         
-        # Check for basic SQL structure
-        if 'FROM' not in sql_upper:
-            print("❌ SQL missing FROM clause")
+        # Exactly one statement, and it must be a SELECT (or SELECTs joined by UNION)
+        if len(statements) != 1 or not isinstance(statements[0], (exp.Select, exp.Union)):
+            print("❌ SQL must be a single SELECT statement")
             return False
         
-        # Additional checks for common SQL patterns
-        if sql_upper.count('(') != sql_upper.count(')'):
-            print("❌ Unbalanced parentheses")
+        # Nothing inside it (e.g. a subquery or a UNION branch) may write or change the schema
+        dangerous = next(statements[0].find_all(*_WRITE_NODES), None)
+        if dangerous is not None:
+            print(f"❌ Dangerous operation found: {dangerous.key.upper()}")
+            return False
+        
+        # Check for basic SQL structure
+        if statements[0].find(exp.From) is None:
+            print("❌ SQL missing FROM clause")
             return False
         
         print("✅ SQL passed all safety checks")
         return True
     
-    def _execute_query(self, sql_query: str) -> List[Dict[str, Any]]:
+    def _execute_query(self, sql_query: str, validate: bool = False) -> List[Mapping[str, Any]]:
         """
-        Step 4: Execute the SQL query and return results as list of dictionaries
+        Step 4: Execute the SQL query and return results as a list of row mappings
+        
+        Rows are kept as SQLAlchemy RowMappings (read-only dicts) instead of
+        being copied into dicts.
+        
+        A syntax error fails the real query just as it would fail EXPLAIN, so
+        the EXPLAIN pre-check (an extra round-trip) only runs when validate=True.
         """
         try:
-            with self.engine.connect() as connection:
-                # First, test the query with EXPLAIN to catch syntax errors
+            try:
+                return self._run_query(sql_query, validate)
+            except DBAPIError as e:
+                if not e.connection_invalidated:
+                    raise
+                # The server dropped our connection: reconnect once and retry
+                print("🔄 Database connection lost, reconnecting...")
+                self.__dict__.pop('_conn').close()
+                return self._run_query(sql_query, validate)
+                
+        except Exception as e:
+            print(f"❌ Execution failed: {e}")
+            raise
+    
+    def _run_query(self, sql_query: str, validate: bool) -> List[Mapping[str, Any]]:
+        # Each query runs in its own transaction on the long-lived connection
+        with self._conn.begin():
+            # Optionally test the query with EXPLAIN to catch syntax errors
+            if validate:
                 try:
-                    connection.execute(text(f"EXPLAIN {sql_query}"))
+                    self._conn.execute(text(f"EXPLAIN {sql_query}"))
                     print("✅ SQL syntax validated")
                 except Exception as explain_error:
                     print(f"❌ SQL syntax error caught: {explain_error}")
                     raise Exception(f"SQL syntax error: {explain_error}")
-                
-                # If EXPLAIN worked, execute the actual query
-                result = connection.execute(text(sql_query))
-                column_names = result.keys()
-                rows = result.fetchall()
-                
-                # Convert to list of dictionaries for easy handling
-                results = []
-                for row in rows:
-                    row_dict = dict(zip(column_names, row))
-                    results.append(row_dict)
-                
-                print(f"✅ Query executed successfully, got {len(results)} rows")
-                return results
-                
-        except Exception as e:
-            print(f"❌ Execution failed: {e}")
-            raise
+            
+            # Execute the actual query
+            results = self._conn.execute(text(sql_query)).mappings().all()
+        
+        print(f"✅ Query executed successfully, got {len(results)} rows")
+        return results
     
     def _error_response(self, error_message: str) -> Dict[str, Any]:
         """Standard error response format"""
@@ -419,9 +606,10 @@ if __name__ == "__main__":
     print("\n🧪 Testing Simple Queries:")
     print("=" * 60)
     
-    for query in test_queries:
-        result = pipeline.process_query(query)
-        
+    # All questions go to the LLM at once instead of one after another
+    results = asyncio.run(pipeline.aprocess_queries(test_queries))
+    
+    for query, result in zip(test_queries, results):
         if result['success']:
             print(f"✅ '{query}'")
             print(f"   SQL: {result['sql_query']}")
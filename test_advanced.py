@@ -3,6 +3,8 @@
 Test the new Advanced SQL Pipeline
 """
 
+import asyncio
+
 from advanced_pipeline import AdvancedSQLPipeline
 
 def test_advanced_pipeline():
@@ -14,17 +16,22 @@ def test_advanced_pipeline():
         pipeline = AdvancedSQLPipeline()
         print("✅ Pipeline initialized successfully!")
         
+        # Send the simple and JOIN queries to the LLM concurrently
+        print("\n📝 Testing simple and JOIN queries...")
+        simple_result, join_result = asyncio.run(pipeline.aprocess_queries([
+            "Show me all employees",
+            "Get me orders with customer names"
+        ]))
+        
         # Test a simple query
-        print("\n📝 Testing simple query...")
-        result = pipeline.process_query("Show me all employees")
+        result = simple_result
         if result['success']:
             print(f"✅ Simple query works! Found {result['result_count']} rows")
         else:
             print(f"❌ Simple query failed: {result['error']}")
         
         # Test a JOIN query
-        print("\n📝 Testing JOIN query...")
-        result = pipeline.process_query("Get me orders with customer names")
+        result = join_result
         if result['success']:
             print(f"✅ JOIN query works! Found {result['result_count']} rows")
             print(f"🎯 Tables involved: {result['target_table']}")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Test question normalization for the semantic cache
+"""
+
+from semantic_cache import normalize_question, question_key
+
+
+def test_normalize_question():
+    """Filler words and punctuation go, the words that pick the rows stay"""
+    assert normalize_question("Show me the customers!") == "show customers"
+    assert normalize_question("show all   CUSTOMERS") == "show customers"
+
+
+def test_normalize_question_keeps_operators():
+    """Comparison operators and signs are part of the question"""
+    assert normalize_question("show orders with amount > 100") == "show orders with amount > 100"
+    assert normalize_question("show orders with amount <= -5") == "show orders with amount <= - 5"
+    assert normalize_question("orders where status != 'paid'") == "orders where status != paid"
+
+
+def test_question_key():
+    """Rephrasings share a key; different comparisons don't"""
+    assert question_key("Show me the customers!") == question_key("show all customers")
+    assert question_key("orders with amount > 100") != question_key("orders with amount < 100")
+    assert len(question_key("show customers")) == 64
+
+
+if __name__ == "__main__":
+    test_normalize_question()
+    test_normalize_question_keeps_operators()
+    test_question_key()
+    print("✅ Semantic cache tests passed")
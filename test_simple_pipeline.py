@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test SQL extraction from LLM responses in the simple pipeline
+"""
+
+from simple_pipeline import _extract_sql
+
+
+def test_extract_sql_skips_prose():
+    """Prose before the query isn't taken for SQL, even if it says "select\""""
+    response = "To select all customers, run:\nSELECT * FROM customers"
+    assert _extract_sql(response) == "SELECT * FROM customers"
+
+
+def test_extract_sql_keeps_quoted_semicolon():
+    """A ';' inside a string literal doesn't end the statement"""
+    response = "SELECT * FROM notes WHERE note = 'a;b'; -- done"
+    assert _extract_sql(response) == "SELECT * FROM notes WHERE note = 'a;b'"
+
+
+def test_extract_sql_keeps_cte():
+    """WITH queries keep their CTE"""
+    response = "WITH recent AS (SELECT * FROM orders WHERE total > 10)\nSELECT COUNT(*) FROM recent"
+    assert _extract_sql(response) == "WITH recent AS (SELECT * FROM orders WHERE total > 10) SELECT COUNT(*) FROM recent"
+
+
+def test_extract_sql_from_fence():
+    """Fenced output: the whole multi-line query, aliases and continuation lines included"""
+    response = (
+        "Here is the query:\n"
+        "```sql\n"
+        "SELECT c.name\n"
+        "FROM customers c\n"
+        "WHERE c.city = 'NYC'\n"
+        "  AND c.state = 'NY'\n"
+        "```\n"
+        "It returns the customers in New York."
+    )
+    assert _extract_sql(response) == "SELECT c.name FROM customers c WHERE c.city = 'NYC' AND c.state = 'NY'"
+
+
+def test_extract_sql_stops_at_blank_line():
+    """An explanation after a blank line isn't part of the query"""
+    response = "SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id\n\nThis joins orders to customers."
+    assert _extract_sql(response) == "SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id"
+
+
+if __name__ == "__main__":
+    test_extract_sql_skips_prose()
+    test_extract_sql_keeps_quoted_semicolon()
+    test_extract_sql_keeps_cte()
+    test_extract_sql_from_fence()
+    test_extract_sql_stops_at_blank_line()
+    print("✅ SQL extraction tests passed")
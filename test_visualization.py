@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test the visualizer's DataFrame preparation
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from visualization import _to_categoricals
+
+
+def _frame_from_sql() -> pd.DataFrame:
+    """A small result set read back through pandas, like the pipelines' query results"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (id INTEGER, city TEXT, note TEXT, amount REAL)")
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?)",
+        [(i, ["NYC", "LA", "SF"][i % 3], f"note {i}", i * 1.5) for i in range(200)]
+    )
+    return pd.read_sql_query("SELECT * FROM orders", conn)
+
+
+def test_to_categoricals_on_sql_frame():
+    """Repetitive text columns become categories whatever dtype pandas loads text as"""
+    df = _frame_from_sql()
+    converted = _to_categoricals(df)
+    
+    assert isinstance(converted["city"].dtype, pd.CategoricalDtype)
+    assert set(converted["city"].cat.categories) == {"NYC", "LA", "SF"}
+    
+    # Unique-per-row text and numbers are left alone, and so is the caller's frame
+    assert not isinstance(converted["note"].dtype, pd.CategoricalDtype)
+    assert converted["amount"].dtype == df["amount"].dtype
+    assert not isinstance(df["city"].dtype, pd.CategoricalDtype)
+
+
+def test_to_categoricals_is_idempotent():
+    """Running it on an already converted frame changes nothing"""
+    converted = _to_categoricals(_frame_from_sql())
+    assert _to_categoricals(converted) is converted
+
+
+if __name__ == "__main__":
+    test_to_categoricals_on_sql_frame()
+    test_to_categoricals_is_idempotent()
+    print("✅ Visualization tests passed")
@@ -1,18 +1,86 @@
 # advanced_visualization.py - Advanced Plotly-based Visualization System
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import plotly.io as pio
 from typing import List, Dict, Any, Optional, Tuple
+import re
 import warnings
 import numpy as np
-from datetime import datetime
+from collections import deque
+from datetime import date, datetime
+from functools import cached_property, lru_cache
 
-# Configure Plotly for better aesthetics
-pio.templates.default = "plotly_white"
 warnings.filterwarnings('ignore')
 
+# Text that starts like a date: 2024-01-31, 31/01/2024, 2024.01.31 12:30, ...
+_DATE_RE = re.compile(r'^\s*\d{2,4}[-/.]\d{1,2}[-/.]\d{1,2}([ T]\d{1,2}:\d{2})?')
+
+
+@lru_cache(maxsize=None)
+def _go():
+    """
+    plotly.graph_objects, imported on first use
+    
+    Plotly takes a noticeable time to import, so it is only loaded once a chart
+    is drawn; analysis-only use of the visualizer never pays for it.
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    
+    # Configure Plotly for better aesthetics
+    pio.templates.default = "plotly_white"
+    
+    # Serialize figures with orjson (already a requirement) instead of the stdlib json
+    pio.json.config.default_engine = "orjson"
+    return go
+
+
+def _classify_columns(df: pd.DataFrame) -> Dict[str, List[str]]:
+    """Group columns by dtype in a single pass over df.dtypes"""
+    groups = {'number': [], 'object': [], 'datetime64': []}
+    for col, dtype in df.dtypes.items():
+        kind = dtype.kind
+        if kind in 'iufc':
+            groups['number'].append(col)
+        elif kind == 'O':
+            groups['object'].append(col)
+        elif kind == 'M':
+            groups['datetime64'].append(col)
+    return groups
+
+
+def _to_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df with low-cardinality text columns converted to the category dtype"""
+    # Text is object dtype, or the str dtype pandas 3 loads it as by default
+    object_cols = [
+        col for col, dtype in df.dtypes.items()
+        if (dtype.kind == 'O' or pd.api.types.is_string_dtype(dtype))
+        and not isinstance(dtype, pd.CategoricalDtype)
+    ]
+    if not object_cols:
+        return df
+    
+    nuniques = df[object_cols].nunique()
+    few_values = nuniques[nuniques < max(50, 0.5 * len(df))].index
+    if len(few_values) == 0:
+        return df
+    return df.astype({col: 'category' for col in few_values})
+
+
+def _downcast_numbers(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return df with integer columns in the smallest integer dtype that holds
+    them and float columns as float32 where pandas allows it (its check
+    tolerates differences up to about 5e-4, so floats can lose precision)
+    """
+    smaller = {}
+    for col, dtype in df.dtypes.items():
+        if dtype.kind in 'fiu':
+            downcast = 'float' if dtype.kind == 'f' else 'integer'
+            new_dtype = pd.to_numeric(df[col], downcast=downcast).dtype
+            if new_dtype != dtype:
+                smaller[col] = new_dtype
+    return df.astype(smaller) if smaller else df
+
+
 class AdvancedDataVisualizer:
     """
     Advanced data visualization system using Plotly
@@ -25,16 +93,39 @@ class AdvancedDataVisualizer:
     - Export capabilities
     """
     
-    def __init__(self, data: List[Dict[str, Any]]):
+    def __init__(self, data: List[Dict[str, Any]] = None, df: Optional[pd.DataFrame] = None,
+                 webgl_threshold: int = 1000, max_points: int = 50_000,
+                 downcast_numbers: bool = True):
         """
         Initialize the visualizer with data
         
         Args:
-            data: List of dictionaries (SQL query results)
+            data: List of dictionaries (SQL query results); only turned into a
+                DataFrame when a chart or analysis first needs it
+            df: Ready-made DataFrame of the results; used instead of data
+            webgl_threshold: Row count from which scatter and line charts are
+                drawn with WebGL (go.Scattergl) instead of SVG
+            max_points: Most points a scatter, line or 3D chart plots; larger
+                results are downsampled first
+            downcast_numbers: Store numeric columns as float32 / the smallest
+                integer type that fits, which halves (or better) the numbers
+                Plotly serializes into every chart; sums for bar and pie
+                charts are still computed in float64
         """
         self.raw_data = data
-        self.df = pd.DataFrame(data) if data else pd.DataFrame()
-        self.chart_history = []
+        self.webgl_threshold = webgl_threshold
+        self.max_points = max_points
+        self.downcast_numbers = downcast_numbers
+        self.chart_history = deque(maxlen=100)  # bounded for long sessions
+        
+        # The DataFrame is prepared on first use (see the df property)
+        self._source_df = df
+        self._df = None
+        
+        # Result of analyze_data_structure() and per-column group sums;
+        # reset by _invalidate_cache() when self.df is replaced
+        self._analysis_cache = None
+        self._groupby_cache: Dict[Tuple[str, str, str], pd.DataFrame] = {}
         
         # Set professional color scheme
         self.colors = {
@@ -46,12 +137,58 @@ class AdvancedDataVisualizer:
             'pastel': ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99', '#ff99cc']
         }
         
-        print(f"🎨 Advanced Visualizer initialized with {len(self.df)} rows and {len(self.df.columns)} columns")
+        if df is not None:
+            n_rows, n_cols = len(df), len(df.columns)
+        else:
+            n_rows, n_cols = (len(data), len(data[0])) if data else (0, 0)
+        print(f"🎨 Advanced Visualizer initialized with {n_rows} rows and {n_cols} columns")
+    
+    @property
+    def df(self) -> pd.DataFrame:
+        """The results as a DataFrame, built the first time a chart or analysis needs it"""
+        if self._df is None:
+            if self._source_df is not None:
+                frame = self._source_df
+            else:
+                frame = pd.DataFrame(self.raw_data) if self.raw_data else pd.DataFrame()
+            
+            self._df = self._prepare_frame(frame)
+            self._source_df = None
+        return self._df
+    
+    @df.setter
+    def df(self, frame: pd.DataFrame):
+        self._df = self._prepare_frame(frame)
+        self._invalidate_cache()
+    
+    def _prepare_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        # Repetitive text columns as Categoricals: group-bys hash small int codes
+        # instead of Python strings, and they take much less memory. astype
+        # returns a new frame, so a DataFrame passed in by the caller is untouched.
+        frame = _to_categoricals(frame)
+        if self.downcast_numbers:
+            frame = _downcast_numbers(frame)
+        return frame
+    
+    @cached_property
+    def _col_groups(self) -> Dict[str, List[str]]:
+        # Column names by dtype group, used by the command handlers in adv_main
+        return _classify_columns(self.df)
+    
+    @cached_property
+    def _np_cols(self) -> Dict[str, np.ndarray]:
+        # Each column as a bare numpy array for chart traces (no index to serialize)
+        return {col: self.df[col].to_numpy() for col in self.df.columns}
     
     def analyze_data_structure(self) -> Dict[str, Any]:
         """
         Analyze data structure to determine best visualization options
+        
+        The result is computed once per DataFrame and reused afterwards.
         """
+        if self._analysis_cache is not None:
+            return self._analysis_cache
+        
         if self.df.empty:
             return {"error": "No data to analyze"}
         
@@ -66,33 +203,115 @@ class AdvancedDataVisualizer:
             "recommended_charts": []
         }
         
-        for col in self.df.columns:
-            col_type = str(self.df[col].dtype)
-            analysis["column_types"][col] = col_type
-            
-            # Categorize columns
-            if col_type in ['int64', 'float64']:
-                analysis["numeric_columns"].append(col)
-            elif col_type == 'object':
-                if self.df[col].dtype == 'datetime64[ns]' or self._is_date_column(col):
-                    analysis["date_columns"].append(col)
-                elif self.df[col].nunique() < 20:  # Low cardinality = categorical
-                    analysis["categorical_columns"].append(col)
-                else:
-                    analysis["text_columns"].append(col)
+        analysis["column_types"] = self.df.dtypes.astype(str).to_dict()
+        
+        # Categorize columns from the dtype groups built in __init__
+        groups = self._col_groups
+        analysis["numeric_columns"] = list(groups['number'])
+        
+        # Object columns are dates if their values parse as dates...
+        object_dates = [col for col in groups['object'] if self._is_date_column(col)]
+        analysis["date_columns"] = groups['datetime64'] + object_dates
+        
+        # ...otherwise categorical or free text, by cardinality (one nunique call)
+        others = [col for col in groups['object'] if col not in object_dates]
+        nuniques = self.df[others].nunique()
+        low_cardinality = nuniques < 20
+        analysis["categorical_columns"] = nuniques[low_cardinality].index.tolist()
+        analysis["text_columns"] = nuniques[~low_cardinality].index.tolist()
         
         # Recommend chart types based on data structure
         analysis["recommended_charts"] = self._get_recommended_charts(analysis)
         
+        self._analysis_cache = analysis
         return analysis
     
+    def _invalidate_cache(self):
+        """Forget results derived from self.df; the df setter calls this"""
+        self.__dict__.pop('_col_groups', None)
+        self.__dict__.pop('_np_cols', None)
+        self._analysis_cache = None
+        self._groupby_cache.clear()
+    
     def _is_date_column(self, col: str) -> bool:
         """Check if a column contains date-like data"""
-        try:
-            pd.to_datetime(self.df[col].dropna().head(10))
+        if pd.api.types.is_datetime64_any_dtype(self.df.dtypes[col]):
             return True
-        except:
-            return False
+        
+        # Otherwise judge by the first non-null of the first 10 raw values
+        # instead of running the full date parser: MySQL DATE/DATETIME values
+        # arrive as date objects, and dates stored as text look like 2024-01-31
+        for value in self._np_cols[col][:10]:
+            if pd.isna(value):
+                continue
+            if isinstance(value, date):  # datetime is a subclass of date
+                return True
+            return isinstance(value, str) and _DATE_RE.match(value) is not None
+        return False
+    
+    def _first_col(self, group: str, exclude: Optional[str] = None) -> Optional[str]:
+        """First column of a dtype group other than exclude, else the first other column; None if there is none"""
+        for col in self._col_groups[group] + list(self.df.columns):
+            if col != exclude:
+                return col
+        return None
+    
+    def _pick_pair(self, x_col: Optional[str], y_col: Optional[str], x_group: str,
+                   chart: str) -> Optional[Tuple[str, str]]:
+        """
+        x and y columns for a two-column chart, auto-picking any not given
+        (x from x_group, y numeric). Returns None, with a message, unless they
+        are two different columns - grouping a column by itself fails.
+        """
+        x_col = x_col or self._first_col(x_group, exclude=y_col)
+        y_col = y_col or self._first_col('number', exclude=x_col)
+        if x_col is None or y_col is None or x_col == y_col:
+            print(f"❌ Not enough columns for a {chart}: it needs two different columns")
+            return None
+        return x_col, y_col
+    
+    def _scatter_cls(self, n: int):
+        """go.Scattergl for n >= webgl_threshold points (SVG slows down past ~1k markers), else go.Scatter"""
+        go = _go()
+        return go.Scattergl if n >= self.webgl_threshold else go.Scatter
+    
+    def _sample_indices(self, n: int, ordered: bool = False) -> Optional[np.ndarray]:
+        """
+        Row positions to plot when n is over max_points, or None to plot every row
+        
+        Scatter plots get a random sample (kept in row order); ordered data
+        such as a line sorted by x gets evenly spaced rows so its shape is kept.
+        """
+        if n <= self.max_points:
+            return None
+        
+        if ordered:
+            idx = np.linspace(0, n - 1, self.max_points).astype(int)
+        else:
+            # A fresh generator with a fixed seed, so redrawing gives the same sample
+            rng = np.random.default_rng(0)
+            idx = np.sort(rng.choice(n, self.max_points, replace=False))
+        print(f"📉 Plotting {self.max_points:,} of {n:,} points")
+        return idx
+    
+    def _col_values(self, col: str, idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """Column as a numpy array, limited to the rows in idx if given"""
+        values = self._np_cols[col]
+        return values if idx is None else values[idx]
+    
+    def _grouped_sum(self, by: str, col: str) -> pd.DataFrame:
+        """Sum of col per value of by, computed once per pair of columns"""
+        key = (by, col, 'sum')
+        if key not in self._groupby_cache:
+            # Sum downcast float32 columns at full precision, so totals stay exact to the cent
+            values = self.df[col]
+            if values.dtype.kind == 'f':
+                values = values.astype(np.float64)
+            
+            # Keep groups in the order the query returned them (no sort), and
+            # skip unused categories
+            self._groupby_cache[key] = values.groupby(self.df[by], sort=False, observed=True).sum().reset_index()
+        return self._groupby_cache[key]
     
     def _get_recommended_charts(self, analysis: Dict[str, Any]) -> List[str]:
         """Get recommended chart types based on data analysis"""
@@ -172,30 +391,124 @@ class AdvancedDataVisualizer:
         else:
             self.create_histogram()
     
+    # Trace builders shared by the create_* methods and create_dashboard
+    
+    def _build_bar_trace(self, x_col: str, y_col: str):
+        go = _go()
+        chart_data = self._grouped_sum(x_col, y_col)
+        return go.Bar(
+            x=chart_data[x_col].to_numpy(),
+            y=chart_data[y_col].to_numpy(),
+            marker_color=self.colors['primary'],
+            hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
+        )
+    
+    def _build_line_trace(self, x_col: str, y_col: str):
+        # Sort by x-axis if it's numeric or date
+        if pd.api.types.is_numeric_dtype(self.df[x_col]) or self._is_date_column(x_col):
+            chart_data = self.df.sort_values(x_col)
+        else:
+            chart_data = self.df
+        
+        idx = self._sample_indices(len(chart_data), ordered=True)
+        if idx is not None:
+            chart_data = chart_data.iloc[idx]
+        
+        return self._scatter_cls(len(chart_data))(
+            x=chart_data[x_col].to_numpy(),
+            y=chart_data[y_col].to_numpy(),
+            mode='lines+markers',
+            line=dict(color=self.colors['primary'], width=3),
+            marker=dict(size=6, color=self.colors['secondary']),
+            hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
+        )
+    
+    def _build_scatter_traces(self, x_col: str, y_col: str, color_col: str = None) -> list:
+        idx = self._sample_indices(len(self.df))
+        scatter = self._scatter_cls(len(self.df) if idx is None else len(idx))
+        
+        if not (color_col and color_col in self.df.columns):
+            # Simple scatter
+            return [scatter(
+                x=self._col_values(x_col, idx),
+                y=self._col_values(y_col, idx),
+                mode='markers',
+                marker=dict(size=8, color=self.colors['primary']),
+                hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
+            )]
+        
+        # Color by category: one grouping pass gives the row positions
+        # of every category, which index the column arrays directly
+        data = self.df if idx is None else self.df.iloc[idx]
+        groups = data.groupby(color_col, sort=False, observed=True).indices
+        x_values, y_values = data[x_col].to_numpy(), data[y_col].to_numpy()
+        pastel = self.colors['pastel']
+        # One template for every trace: the category comes from the trace's own name
+        hovertemplate = f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<br><b>{color_col}</b>: %{{fullData.name}}<extra></extra>'
+        return [
+            scatter(
+                x=x_values[rows],
+                y=y_values[rows],
+                mode='markers',
+                name=str(category),
+                marker=dict(size=8, color=pastel[i % len(pastel)]),
+                hovertemplate=hovertemplate
+            )
+            for i, (category, rows) in enumerate(groups.items())
+        ]
+    
+    def _build_pie_trace(self, labels_col: str, values_col: str):
+        go = _go()
+        chart_data = self._grouped_sum(labels_col, values_col)
+        return go.Pie(
+            labels=chart_data[labels_col].to_numpy(),
+            values=chart_data[values_col].to_numpy(),
+            hole=0.3,  # Donut chart
+            marker_colors=self.colors['pastel'],
+            hovertemplate='<b>%{label}</b><br>Value: %{value}<br>Percentage: %{percent}<extra></extra>'
+        )
+    
+    def _build_histogram_trace(self, column: str, bins: int = 30):
+        go = _go()
+        values = self._np_cols[column]
+        if values.dtype.kind not in 'fiu':
+            # Counts of text/category values; the browser does the counting
+            return go.Histogram(
+                x=values,
+                nbinsx=bins,
+                marker_color=self.colors['primary'],
+                hovertemplate='<b>Range</b>: %{x}<br><b>Count</b>: %{y}<extra></extra>'
+            )
+        
+        # Bin numbers here so only the bins are sent to the browser, not every value
+        if values.dtype.kind == 'f':
+            values = values[~np.isnan(values)]
+        counts, edges = np.histogram(values, bins=bins)
+        return go.Bar(
+            x=0.5 * (edges[:-1] + edges[1:]),
+            y=counts,
+            width=np.diff(edges),
+            customdata=np.column_stack((edges[:-1], edges[1:])),
+            marker_color=self.colors['primary'],
+            hovertemplate='<b>Range</b>: %{customdata[0]:.4g} - %{customdata[1]:.4g}<br><b>Count</b>: %{y}<extra></extra>'
+        )
+    
     def create_bar_chart(self, x_col: str = None, y_col: str = None, title: str = "Bar Chart"):
         """Create an interactive bar chart"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select columns if not specified
-        if not x_col:
-            x_col = self.df.select_dtypes(include=['object']).columns[0] if len(self.df.select_dtypes(include=['object']).columns) > 0 else self.df.columns[0]
-        if not y_col:
-            y_col = self.df.select_dtypes(include=['number']).columns[0] if len(self.df.select_dtypes(include=['number']).columns) > 0 else self.df.columns[1]
+        pair = self._pick_pair(x_col, y_col, 'object', "bar chart")
+        if pair is None:
+            return
+        x_col, y_col = pair
         
         # Prepare data
         if y_col in self.df.columns and x_col in self.df.columns:
-            chart_data = self.df.groupby(x_col)[y_col].sum().reset_index()
-            
-            fig = go.Figure(data=[
-                go.Bar(
-                    x=chart_data[x_col],
-                    y=chart_data[y_col],
-                    marker_color=self.colors['primary'],
-                    hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
-                )
-            ])
+            fig = go.Figure(data=[self._build_bar_trace(x_col, y_col)])
             
             fig.update_layout(
                 title=title,
@@ -214,33 +527,19 @@ class AdvancedDataVisualizer:
     
     def create_line_chart(self, x_col: str = None, y_col: str = None, title: str = "Line Chart"):
         """Create an interactive line chart"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select columns if not specified
-        if not x_col:
-            x_col = self.df.select_dtypes(include=['datetime64']).columns[0] if len(self.df.select_dtypes(include=['datetime64']).columns) > 0 else self.df.columns[0]
-        if not y_col:
-            y_col = self.df.select_dtypes(include=['number']).columns[0] if len(self.df.select_dtypes(include=['number']).columns) > 0 else self.df.columns[1]
+        pair = self._pick_pair(x_col, y_col, 'datetime64', "line chart")
+        if pair is None:
+            return
+        x_col, y_col = pair
         
         if y_col in self.df.columns and x_col in self.df.columns:
-            # Sort by x-axis if it's numeric or date
-            if self.df[x_col].dtype in ['int64', 'float64'] or self._is_date_column(x_col):
-                chart_data = self.df.sort_values(x_col)
-            else:
-                chart_data = self.df
-            
-            fig = go.Figure(data=[
-                go.Scatter(
-                    x=chart_data[x_col],
-                    y=chart_data[y_col],
-                    mode='lines+markers',
-                    line=dict(color=self.colors['primary'], width=3),
-                    marker=dict(size=6, color=self.colors['secondary']),
-                    hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
-                )
-            ])
+            fig = go.Figure(data=[self._build_line_trace(x_col, y_col)])
             
             fig.update_layout(
                 title=title,
@@ -259,12 +558,13 @@ class AdvancedDataVisualizer:
     
     def create_scatter_plot(self, x_col: str = None, y_col: str = None, color_col: str = None, title: str = "Scatter Plot"):
         """Create an interactive scatter plot"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select columns if not specified
-        numeric_cols = self.df.select_dtypes(include=['number']).columns
+        numeric_cols = self._col_groups['number']
         if len(numeric_cols) >= 2:
             if not x_col:
                 x_col = numeric_cols[0]
@@ -272,30 +572,7 @@ class AdvancedDataVisualizer:
                 y_col = numeric_cols[1]
         
         if y_col in self.df.columns and x_col in self.df.columns:
-            fig = go.Figure()
-            
-            if color_col and color_col in self.df.columns:
-                # Color by category
-                categories = self.df[color_col].unique()
-                for i, category in enumerate(categories):
-                    subset = self.df[self.df[color_col] == category]
-                    fig.add_trace(go.Scatter(
-                        x=subset[x_col],
-                        y=subset[y_col],
-                        mode='markers',
-                        name=str(category),
-                        marker=dict(size=8, color=self.colors['pastel'][i % len(self.colors['pastel'])]),
-                        hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<br><b>{color_col}</b>: {category}<extra></extra>'
-                    ))
-            else:
-                # Simple scatter
-                fig.add_trace(go.Scatter(
-                    x=self.df[x_col],
-                    y=self.df[y_col],
-                    mode='markers',
-                    marker=dict(size=8, color=self.colors['primary']),
-                    hovertemplate=f'<b>{x_col}</b>: %{{x}}<br><b>{y_col}</b>: %{{y}}<extra></extra>'
-                ))
+            fig = go.Figure(data=self._build_scatter_traces(x_col, y_col, color_col))
             
             fig.update_layout(
                 title=title,
@@ -313,29 +590,19 @@ class AdvancedDataVisualizer:
     
     def create_pie_chart(self, labels_col: str = None, values_col: str = None, title: str = "Pie Chart"):
         """Create an interactive pie chart"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select columns if not specified
-        if not labels_col:
-            labels_col = self.df.select_dtypes(include=['object']).columns[0] if len(self.df.select_dtypes(include=['object']).columns) > 0 else self.df.columns[0]
-        if not values_col:
-            values_col = self.df.select_dtypes(include=['number']).columns[0] if len(self.df.select_dtypes(include=['number']).columns) > 0 else self.df.columns[1]
+        pair = self._pick_pair(labels_col, values_col, 'object', "pie chart")
+        if pair is None:
+            return
+        labels_col, values_col = pair
         
         if labels_col in self.df.columns and values_col in self.df.columns:
-            # Aggregate data
-            chart_data = self.df.groupby(labels_col)[values_col].sum().reset_index()
-            
-            fig = go.Figure(data=[
-                go.Pie(
-                    labels=chart_data[labels_col],
-                    values=chart_data[values_col],
-                    hole=0.3,  # Donut chart
-                    marker_colors=self.colors['pastel'],
-                    hovertemplate='<b>%{label}</b><br>Value: %{value}<br>Percentage: %{percent}<extra></extra>'
-                )
-            ])
+            fig = go.Figure(data=[self._build_pie_trace(labels_col, values_col)])
             
             fig.update_layout(
                 title=title,
@@ -352,23 +619,17 @@ class AdvancedDataVisualizer:
     
     def create_histogram(self, column: str = None, bins: int = 30, title: str = "Histogram"):
         """Create an interactive histogram"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select column if not specified
         if not column:
-            column = self.df.select_dtypes(include=['number']).columns[0] if len(self.df.select_dtypes(include=['number']).columns) > 0 else self.df.columns[0]
+            column = self._first_col('number')
         
         if column in self.df.columns:
-            fig = go.Figure(data=[
-                go.Histogram(
-                    x=self.df[column],
-                    nbinsx=bins,
-                    marker_color=self.colors['primary'],
-                    hovertemplate='<b>Range</b>: %{x}<br><b>Count</b>: %{y}<extra></extra>'
-                )
-            ])
+            fig = go.Figure(data=[self._build_histogram_trace(column, bins)])
             
             fig.update_layout(
                 title=f"Distribution of {column}",
@@ -387,18 +648,28 @@ class AdvancedDataVisualizer:
     
     def create_heatmap(self, title: str = "Correlation Heatmap"):
         """Create a correlation heatmap for numeric columns"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
-        numeric_df = self.df.select_dtypes(include=['number'])
+        numeric_df = self.df[self._col_groups['number']]
         
         if len(numeric_df.columns) < 2:
             print("❌ Need at least 2 numeric columns for heatmap")
             return
         
-        # Calculate correlation matrix
-        corr_matrix = numeric_df.corr()
+        # Calculate correlation matrix. Without NULLs numpy does it as one
+        # matrix product; pandas is only needed for pairwise NaN handling
+        values = numeric_df.to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            corr_matrix = numeric_df.corr()
+        else:
+            corr_matrix = pd.DataFrame(
+                np.corrcoef(values, rowvar=False),
+                index=numeric_df.columns,
+                columns=numeric_df.columns
+            )
         
         fig = go.Figure(data=[
             go.Heatmap(
@@ -425,12 +696,13 @@ class AdvancedDataVisualizer:
     
     def create_3d_scatter(self, x_col: str = None, y_col: str = None, z_col: str = None, title: str = "3D Scatter Plot"):
         """Create a 3D scatter plot"""
+        go = _go()
         if self.df.empty:
             print("❌ No data available")
             return
         
         # Auto-select columns if not specified
-        numeric_cols = self.df.select_dtypes(include=['number']).columns
+        numeric_cols = self._col_groups['number']
         if len(numeric_cols) >= 3:
             if not x_col:
                 x_col = numeric_cols[0]
@@ -440,15 +712,17 @@ class AdvancedDataVisualizer:
                 z_col = numeric_cols[2]
         
         if all(col in self.df.columns for col in [x_col, y_col, z_col]):
+            idx = self._sample_indices(len(self.df))
+            z_values = self._col_values(z_col, idx)
             fig = go.Figure(data=[
                 go.Scatter3d(
-                    x=self.df[x_col],
-                    y=self.df[y_col],
-                    z=self.df[z_col],
+                    x=self._col_values(x_col, idx),
+                    y=self._col_values(y_col, idx),
+                    z=z_values,
                     mode='markers',
                     marker=dict(
                         size=6,
-                        color=self.df[z_col],
+                        color=z_values,
                         colorscale='Viridis',
                         opacity=0.8
                     ),
@@ -486,35 +760,56 @@ class AdvancedDataVisualizer:
             
             if len(analysis["numeric_columns"]) >= 2:
                 charts.append(("Bar Chart", "Distribution"))
-            if len(analysis["date_columns"]) >= 1:
+            if len(analysis["date_columns"]) >= 1 and len(analysis["numeric_columns"]) >= 1:
                 charts.append(("Line Chart", "Trends"))
             if len(analysis["numeric_columns"]) >= 2:
                 charts.append(("Scatter Plot", "Correlation"))
-            if len(analysis["categorical_columns"]) >= 1:
+            if len(analysis["categorical_columns"]) >= 1 and len(analysis["numeric_columns"]) >= 1:
                 charts.append(("Pie Chart", "Composition"))
         
-        # Create subplot layout
+        # One trace per chart, on the same default columns the create_* methods
+        # pick; charts without two different columns to plot are left out
+        builders = {
+            "Bar Chart": ('object', self._build_bar_trace),
+            "Line Chart": ('datetime64', self._build_line_trace),
+            "Scatter Plot": ('number', lambda x_col, y_col: self._build_scatter_traces(x_col, y_col)[0]),
+            "Pie Chart": ('object', self._build_pie_trace),
+        }
+        planned = []
+        for chart_type, title in charts:
+            if chart_type == "Histogram":
+                planned.append((chart_type, title, self._build_histogram_trace(self._first_col('number'))))
+            elif chart_type in builders:
+                x_group, build = builders[chart_type]
+                pair = self._pick_pair(None, None, x_group, chart_type.lower())
+                if pair is not None:
+                    planned.append((chart_type, title, build(*pair)))
+        charts = [(chart_type, title) for chart_type, title, _ in planned]
+        if not charts:
+            print("❌ Not enough data for a dashboard")
+            return
+        
+        # Create subplot layout (pies need a 'domain' cell instead of x/y axes)
         rows = (len(charts) + 1) // 2
         cols = min(2, len(charts))
+        specs = [[None] * cols for _ in range(rows)]
+        for i, (chart_type, _) in enumerate(charts):
+            specs[i // 2][i % 2] = {"type": "domain" if chart_type == "Pie Chart" else "xy"}
         
+        _go()  # imports and configures Plotly before the figure is built
+        from plotly.subplots import make_subplots
         fig = make_subplots(
             rows=rows, cols=cols,
             subplot_titles=[title for _, title in charts],
-            specs=[[{"secondary_y": False}] * cols] * rows
+            specs=specs
         )
         
-        # Add charts to subplots
-        for i, (chart_type, title) in enumerate(charts):
-            row = (i // 2) + 1
-            col = (i % 2) + 1
-            
-            if chart_type == "Bar Chart":
-                # Add bar chart
-                pass  # Implementation would go here
-            elif chart_type == "Line Chart":
-                # Add line chart
-                pass  # Implementation would go here
-            # ... other chart types
+        # Add every chart's trace in one call
+        fig.add_traces(
+            [trace for _, _, trace in planned],
+            rows=[(i // 2) + 1 for i in range(len(charts))],
+            cols=[(i % 2) + 1 for i in range(len(charts))]
+        )
         
         fig.update_layout(
             title="Data Dashboard",